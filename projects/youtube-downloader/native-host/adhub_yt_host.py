@@ -19,13 +19,24 @@ Pokud vse selze: Doporucit "Zakladni stahovani" (do 720p)
 
 import sys
 import os
+import re
 import json
 import struct
 import subprocess
 import shutil
 import time
+import threading
 import urllib.request
 import ssl
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# yt-dlp jako Python modul - pokud je dostupny, stahuje se primo v procesu
+# hostu (viz handle_download_inprocess), jinak pres spustitelny soubor
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
 
 # ============================================================================
 # KONFIGURACE
@@ -34,6 +45,20 @@ import ssl
 VERSION = '6.1'
 MAX_RETRIES = 6  # Pocet strategii k vyzkouseni (vice variant)
 RETRY_DELAY = 1  # sekundy - kratsi pro rychlejsi retry
+TOOL_PROBE_TIMEOUT = 10  # sekundy - max. doba behu '<nastroj> --version'
+MAX_PARALLEL_REQUESTS = 4  # Max. pocet soubeznych dlouhych pozadavku s requestId (LONG_ACTIONS)
+LONG_ACTIONS = ('download', 'updateYtdlp')  # Akce, ktere mohou bezet minuty
+QUICK_WORKERS = 2  # Vlakna pro ostatni akce (check, test...) - necekaji za stahovanim
+DOWNLOAD_TIMEOUT = 900  # sekundy - 15 minut timeout pro velka videa
+PROGRESS_INTERVAL = 0.5  # sekundy - min. odstup zprav o prubehu
+OUTPUT_TAIL_LINES = 200  # Kolik poslednich radku vystupu yt-dlp drzet pro chybove hlasky
+
+# Radek s prubehem (--progress-template): bajty stazeno, celkem, odhad celkem, rychlost, eta
+PROGRESS_MARKER = 'ADHUB_PROGRESS'
+PROGRESS_TEMPLATE = (
+    f'download:{PROGRESS_MARKER} %(progress.downloaded_bytes)s %(progress.total_bytes)s '
+    '%(progress.total_bytes_estimate)s %(progress.speed)s %(progress.eta)s'
+)
 YTDLP_RELEASES_URL = 'https://api.github.com/repos/yt-dlp/yt-dlp/releases/latest'
 YTDLP_DOWNLOAD_URL = 'https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp.exe'
 
@@ -126,6 +151,28 @@ DEFAULT_FFMPEG_PATHS = [
     os.path.join(os.environ.get('LOCALAPPDATA', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
 ]
 
+# Cache nalezenych nastroju - find_tool() pak misto spousteni
+# '--version' jen overi stat() souboru
+if os.environ.get('LOCALAPPDATA'):
+    TOOL_CACHE_FILE = os.path.join(os.environ['LOCALAPPDATA'], 'AdHub', 'yt_host_tools.json')
+else:
+    TOOL_CACHE_FILE = os.path.expanduser('~/.adhub/yt_host_tools.json')
+
+# Video ID: 11 znaku [0-9A-Za-z_-] - stejny vyraz jako server/yt_server.py
+VIDEO_ID_RE = re.compile(
+    r'^(?:(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch/?\?(?:[^#]*?&)?v=|(?:shorts|embed|live|v|e)/)'
+    r'|youtu\.be/))?'
+    r'([0-9A-Za-z_-]{11})(?:$|[?&#/])'
+)
+
+def extract_video_id(url):
+    """Extrahuje video ID z YouTube URL (nebo holeho ID), jinak vrati None."""
+    if not url:
+        return None
+    match = VIDEO_ID_RE.match(url)
+    return match.group(1) if match else None
+
 # ============================================================================
 # NATIVE MESSAGING PROTOKOL
 # ============================================================================
@@ -140,19 +187,82 @@ def read_message():
     message = sys.stdin.buffer.read(message_length).decode('utf-8')
     return json.loads(message)
 
+_send_lock = threading.Lock()
+
 def send_message(message):
-    """Odesle zpravu na stdout (Chrome Native Messaging protokol)."""
+    """Odesle zpravu na stdout (Chrome Native Messaging protokol).
+
+    Zamek drzi delku a telo zpravy pohromade, kdyz odpovidaji
+    soubezne zpracovavane pozadavky.
+    """
     encoded = json.dumps(message).encode('utf-8')
-    sys.stdout.buffer.write(struct.pack('I', len(encoded)))
-    sys.stdout.buffer.write(encoded)
-    sys.stdout.buffer.flush()
+    with _send_lock:
+        sys.stdout.buffer.write(struct.pack('I', len(encoded)))
+        sys.stdout.buffer.write(encoded)
+        sys.stdout.buffer.flush()
 
 # ============================================================================
 # DETEKCE NASTROJU
 # ============================================================================
 
+_tool_cache = None
+# Cache cte i zapisuje vic soubeznych pozadavku najednou
+_tool_cache_lock = threading.Lock()
+
+def tool_fingerprint(path):
+    """Vrati [mtime_ns, size, inode] souboru nastroje, nebo None pokud neexistuje."""
+    resolved = path if os.path.isabs(path) else shutil.which(path)
+    if not resolved:
+        return None
+    try:
+        st = os.stat(resolved)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+def load_tool_cache():
+    """Nacte cache nastroju z disku (jednou za beh procesu).
+
+    Volat jen pod _tool_cache_lock.
+    """
+    global _tool_cache
+    if _tool_cache is None:
+        try:
+            with open(TOOL_CACHE_FILE, 'r', encoding='utf-8') as f:
+                _tool_cache = json.load(f)
+        except (OSError, ValueError):
+            _tool_cache = {}
+    return _tool_cache
+
+def save_tool_cache():
+    """Ulozi cache nastroju na disk (atomicky pres docasny soubor).
+
+    Volat jen pod _tool_cache_lock. Docasny soubor je unikatni, aby se
+    nepraly zapisy z vice procesu hostu (kazdy tab ma vlastni).
+    """
+    temp_path = None
+    try:
+        cache_dir = os.path.dirname(TOOL_CACHE_FILE)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', prefix='yt_host_tools_', dir=cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(_tool_cache, f)
+        os.replace(temp_path, TOOL_CACHE_FILE)
+    except OSError:
+        if temp_path:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
 def find_tool(tool_name, custom_path=None, default_paths=None):
-    """Najde nastroj a vrati jeho cestu a verzi."""
+    """Najde nastroj a vrati jeho cestu a verzi.
+
+    Nalezeny nastroj se uklada do TOOL_CACHE_FILE. Pri dalsim hledani
+    se overi jen mtime/velikost/inode souboru - pokud sedi, vrati se
+    verze z cache bez spousteni procesu. Aktualizace nebo smazani
+    nastroje cache zneplatni.
+    """
     paths_to_check = []
 
     # Custom path ma prioritu
@@ -164,33 +274,97 @@ def find_tool(tool_name, custom_path=None, default_paths=None):
     if which_path:
         paths_to_check.append(which_path)
 
+    # Zmena custom path nebo PATH = jiny klic
+    cache_key = f'{tool_name}|{custom_path.strip() if custom_path else ""}|{which_path or ""}'
+    with _tool_cache_lock:
+        cached = load_tool_cache().get(cache_key)
+    if cached and cached['fingerprint'] == tool_fingerprint(cached['path']):
+        return {'available': True, 'path': cached['path'], 'version': cached['version']}
+
     # Pak defaultni cesty
     if default_paths:
         paths_to_check.extend(default_paths)
 
-    for path in paths_to_check:
-        result = check_tool_at_path(path, tool_name)
-        if result['available']:
-            return result
+    result = probe_tool_paths(paths_to_check, tool_name)
+    if result:
+        fingerprint = tool_fingerprint(result['path'])
+        if fingerprint:
+            with _tool_cache_lock:
+                load_tool_cache()[cache_key] = {
+                    'path': result['path'],
+                    'version': result['version'],
+                    'fingerprint': fingerprint,
+                }
+                save_tool_cache()
+        return result
 
     return {'available': False, 'path': None, 'version': None}
 
-def check_tool_at_path(path, tool_name=None):
-    """Zkontroluje nastroj na konkretni ceste."""
+def probe_tool_paths(paths, tool_name):
+    """Vyzkousi kandidatni cesty soubezne a vrati prvni funkcni v poradi priority.
+
+    Pred spustenim se vyradi cesty, kde soubor neexistuje nebo neni
+    spustitelny, a duplicity (stejny soubor pres PATH i primou cestu).
+    Zbyle cesty se spusti naraz; jakmile je znam vysledek vsech cest
+    s vyssi prioritou, vrati se prvni funkcni a ostatni procesy se ukonci.
+    """
+    candidates = []
+    seen = set()
+    for path in paths:
+        resolved = path if os.path.isabs(path) else shutil.which(path)
+        if not resolved or not os.path.isfile(resolved) or not os.access(resolved, os.X_OK):
+            continue
+        real_path = os.path.realpath(resolved)
+        if real_path in seen:
+            continue
+        seen.add(real_path)
+        candidates.append(path)
+
+    if not candidates:
+        return None
+
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        futures = [pool.submit(check_tool_at_path, path, tool_name, cancel) for path in candidates]
+        for future in futures:
+            result = future.result()
+            if result['available']:
+                return result
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False)
+    return None
+
+def check_tool_at_path(path, tool_name=None, cancel_event=None):
+    """Zkontroluje nastroj na konkretni ceste.
+
+    Nastaveni `cancel_event` beh kontroly prerusi (proces se ukonci).
+    """
     try:
         # ffmpeg pouziva -version (jedina pomlcka), yt-dlp pouziva --version
         version_flag = '-version' if tool_name == 'ffmpeg' or 'ffmpeg' in path.lower() else '--version'
 
-        result = subprocess.run(
+        process = subprocess.Popen(
             [path, version_flag],
-            capture_output=True,
-            text=True,
-            timeout=10
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
         )
+        deadline = time.monotonic() + TOOL_PROBE_TIMEOUT
+        while True:
+            try:
+                stdout, _ = process.communicate(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                if (cancel_event and cancel_event.is_set()) or time.monotonic() > deadline:
+                    process.kill()
+                    process.communicate()
+                    return {'available': False, 'path': path, 'version': None}
 
-        if result.returncode == 0:
+        if process.returncode == 0:
             # Extrahovat verzi z vystupu
-            output = result.stdout.strip()
+            output = stdout.strip()
             version = output.split('\n')[0] if output else 'unknown'
 
             # Zjednodusit verzi
@@ -210,7 +384,8 @@ def check_tool_at_path(path, tool_name=None):
                 'version': version[:20]  # Max 20 znaku
             }
 
-    except (subprocess.TimeoutExpired, FileNotFoundError, PermissionError):
+    except OSError:
+        # FileNotFoundError, PermissionError, neplatny spustitelny soubor
         pass
 
     return {'available': False, 'path': path, 'version': None}
@@ -335,6 +510,9 @@ def handle_check(message):
         'version': VERSION,
         'ytdlp': ytdlp_result,
         'ffmpeg': ffmpeg_result,
+        # yt-dlp jako Python modul - stahuje se jim misto binarky (viz use_inprocess)
+        'ytdlp_module': yt_dlp.version.__version__ if yt_dlp is not None else None,
+        'ytdlp_inprocess': use_inprocess(message),
         'download_dir': get_download_dir(),
     }
 
@@ -360,38 +538,53 @@ def handle_test(message):
 import tempfile
 import atexit
 
-# Docasny soubor pro cookies
-_temp_cookie_file = None
+# Docasne soubory pro cookies (jeden na stahovani - muze jich bezet vic)
+_temp_cookie_files = set()
 
 def cleanup_temp_cookies():
-    """Vycisti docasny cookies soubor pri ukonceni."""
-    global _temp_cookie_file
-    if _temp_cookie_file and os.path.exists(_temp_cookie_file):
-        try:
-            os.remove(_temp_cookie_file)
-        except:
-            pass
+    """Vycisti docasne cookies soubory pri ukonceni."""
+    for path in list(_temp_cookie_files):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except:
+                pass
 
 atexit.register(cleanup_temp_cookies)
 
 
+def remove_temp_cookies(path):
+    """Smaze docasny cookies soubor po dokonceni stahovani.
+
+    Maze jen soubory vytvorene v save_cookies_to_temp(), nikdy
+    cookies soubor uzivatele nalezeny na disku.
+    """
+    if path not in _temp_cookie_files:
+        return
+    _temp_cookie_files.discard(path)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
 def save_cookies_to_temp(cookies_content):
     """Ulozi cookies z extension do docasneho souboru."""
-    global _temp_cookie_file
-
     if not cookies_content:
         return None
 
+    temp_path = None
     try:
         # Vytvorit docasny soubor
         fd, temp_path = tempfile.mkstemp(suffix='.txt', prefix='adhub_cookies_')
+        _temp_cookie_files.add(temp_path)
         with os.fdopen(fd, 'w') as f:
             f.write(cookies_content)
-
-        _temp_cookie_file = temp_path
         return temp_path
 
     except Exception as e:
+        # Nedopsany soubor nenechavat v tempu
+        remove_temp_cookies(temp_path)
         return None
 
 
@@ -422,6 +615,36 @@ def get_cookies_path(cookies_from_extension=None):
 # AKCE: DOWNLOAD
 # ============================================================================
 
+def use_inprocess(message):
+    """Vrati True, pokud se ma stahovat v procesu hostu misto spusteni yt-dlp.
+
+    Vychozi je modul, pokud jde importovat. Binarka se spusti, kdyz modul
+    chybi, extension zada konkretni ytdlpPath nebo posle 'inProcess': false.
+    """
+    if yt_dlp is None or message.get('ytdlpPath', '').strip():
+        return False
+    return message.get('inProcess', True) is not False
+
+def strategy_format_selector(strategy, format_type, quality, audio_format):
+    """Vrati format selector strategie pro dany typ (s omezenim kvality u videa)."""
+    if format_type == 'audio' or audio_format:
+        # Audio format ze strategie
+        return strategy.get('format_audio', 'ba/b')
+
+    # Video format ze strategie
+    base_format = strategy.get('format_video', 'bv*+ba/b')
+
+    # Aplikovat omezeni kvality pokud je zadano
+    # Pro jednoduchy 'best' nechej jak je (TV klient)
+    if quality and quality != 'best' and base_format not in ['best', 'b'] and '+' in base_format:
+        # Pro komplexni selectory pridej height filter
+        # Napr. 'bv*+ba/b' -> 'bv*[height<=720]+ba/b'
+        parts = base_format.split('+')
+        video_part = parts[0]
+        rest = '+'.join(parts[1:])
+        return f'{video_part}[height<={quality}]+{rest}'
+    return base_format
+
 def handle_download(message, strategy_index=0):
     """Stahne video/audio z YouTube s podporou vsech typu videi.
 
@@ -429,7 +652,14 @@ def handle_download(message, strategy_index=0):
     - Kazda strategie ma vlastni player_client a format selector
     - Ruzne player clients maji ruzne dostupne formaty
     - Fallback strategie pouziva jednoduchy 'best' selector
+
+    Je-li yt-dlp importovatelny jako modul, stahuje se v procesu hostu
+    (handle_download_inprocess) - viz use_inprocess(). Binarka je fallback
+    pro chybejici modul nebo konkretni ytdlpPath.
     """
+    if strategy_index == 0 and use_inprocess(message):
+        return handle_download_inprocess(message)
+
     url = message.get('url')
     format_type = message.get('format', 'video')  # video nebo audio
     quality = message.get('quality', 'best')
@@ -441,6 +671,11 @@ def handle_download(message, strategy_index=0):
     if not url:
         return {'success': False, 'error': 'URL neni zadana'}
 
+    # Kanonicka watch URL - bez playlist/tracking parametru
+    video_id = extract_video_id(url)
+    if video_id:
+        url = f'https://www.youtube.com/watch?v={video_id}'
+
     # Najit yt-dlp
     ytdlp = find_tool('yt-dlp', ytdlp_path, DEFAULT_YTDLP_PATHS)
     if not ytdlp['available']:
@@ -487,6 +722,7 @@ def handle_download(message, strategy_index=0):
 
     # Cookies - pouzit JEN kdyz je extension explicitne posle
     # (pro vekove omezena videa kde je uzivatel prihlasen)
+    cookies_path = None
     cookies_from_ext = message.get('cookies')
     if use_cookies and cookies_from_ext:
         cookies_path = get_cookies_path(cookies_from_ext)
@@ -494,11 +730,8 @@ def handle_download(message, strategy_index=0):
             cmd.extend(['--cookies', cookies_path])
 
     # Format - pouzit selector ze strategie
+    cmd.extend(['-f', strategy_format_selector(strategy, format_type, quality, audio_format)])
     if format_type == 'audio' or audio_format:
-        # Audio format ze strategie
-        audio_selector = strategy.get('format_audio', 'ba/b')
-        cmd.extend(['-f', audio_selector])
-
         if audio_format in ['mp3', 'wav', 'flac', 'ogg', 'm4a', 'aac']:
             cmd.extend(['-x', '--audio-format', audio_format])
             cmd.extend(['--audio-quality', '0'])  # Nejlepsi kvalita
@@ -510,28 +743,8 @@ def handle_download(message, strategy_index=0):
                 if ffmpeg_dir:
                     cmd.extend(['--ffmpeg-location', ffmpeg_dir])
     else:
-        # Video format ze strategie
-        base_format = strategy.get('format_video', 'bv*+ba/b')
-
-        # Aplikovat omezeni kvality pokud je zadano
-        if quality and quality != 'best' and base_format not in ['best', 'b']:
-            # Pro komplexni selectory pridej height filter
-            # Pro jednoduchy 'best' nechej jak je (TV klient)
-            if '+' in base_format:
-                # Napr. 'bv*+ba/b' -> 'bv*[height<=720]+ba/b'
-                parts = base_format.split('+')
-                video_part = parts[0]
-                rest = '+'.join(parts[1:])
-                format_selector = f'{video_part}[height<={quality}]+{rest}'
-            else:
-                format_selector = base_format
-        else:
-            format_selector = base_format
-
-        cmd.extend(['-f', format_selector])
-
         # Merge a remux nastaveni (pouze pokud neni jednoduchy 'best')
-        if base_format not in ['best', 'b']:
+        if strategy.get('format_video', 'bv*+ba/b') not in ['best', 'b']:
             cmd.extend(['--merge-output-format', 'mp4'])
 
         cmd.extend(['--remux-video', 'mp4'])  # Zajistit MP4 format
@@ -543,19 +756,16 @@ def handle_download(message, strategy_index=0):
             if ffmpeg_dir:
                 cmd.extend(['--ffmpeg-location', ffmpeg_dir])
 
+    # Prubeh po radcich - cte se prubezne (viz run_ytdlp)
+    cmd.extend(['--newline', '--progress-template', PROGRESS_TEMPLATE])
+
     cmd.extend(['-o', output_template])
     cmd.append(url)
 
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=900  # 15 minut timeout pro velka videa
-        )
+        result, filename = run_ytdlp(cmd, message.get('requestId'), strategy_desc)
 
         if result.returncode == 0:
-            filename = extract_filename_from_output(result.stdout, result.stderr)
             return {
                 'success': True,
                 'filename': os.path.basename(filename) if filename else 'video.mp4',
@@ -616,6 +826,268 @@ def handle_download(message, strategy_index=0):
             time.sleep(RETRY_DELAY)
             return handle_download(message, next_strategy_index)
         return {'success': False, 'error': str(e)[:200]}
+    finally:
+        # Host bezi dlouho - cookies nenechavat na disku do jeho ukonceni
+        remove_temp_cookies(cookies_path)
+
+
+def run_ytdlp(cmd, request_id=None, strategy_desc=None):
+    """Spusti yt-dlp a cte jeho vystup prubezne.
+
+    Radky s prubehem (PROGRESS_TEMPLATE) se u pozadavku s requestId
+    posilaji extension jako zpravy {'type': 'progress'}, nejvyse jednou
+    za PROGRESS_INTERVAL. Z ostatniho vystupu se drzi jen poslednich
+    OUTPUT_TAIL_LINES radku pro chybove hlasky, ne cely vystup.
+
+    Vraci (CompletedProcess se zkracenym stdout/stderr, nazev souboru).
+    Pri prekroceni DOWNLOAD_TIMEOUT vyhodi subprocess.TimeoutExpired.
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace',
+        bufsize=1
+    )
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(DOWNLOAD_TIMEOUT, kill_on_timeout)
+    timer.daemon = True
+    timer.start()
+
+    # stderr ve vlastnim vlakne, aby plna roura nezablokovala yt-dlp
+    stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    stderr_reader = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+
+    stdout_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    filename = None
+    last_sent = 0.0
+    try:
+        for line in process.stdout:
+            if line.startswith(PROGRESS_MARKER):
+                now = time.monotonic()
+                if request_id is not None and now - last_sent >= PROGRESS_INTERVAL:
+                    last_sent = now
+                    fields = [parse_number(v) for v in line.split()[1:6]]
+                    if len(fields) == 5:
+                        downloaded, total, estimate, speed, eta = fields
+                        send_progress(request_id, downloaded, total or estimate, speed, eta, strategy_desc)
+                continue
+            stdout_tail.append(line)
+            if filename is None:
+                filename = extract_filename_from_output(line, '')
+        process.wait()
+        stderr_reader.join()
+    finally:
+        timer.cancel()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, DOWNLOAD_TIMEOUT)
+
+    stderr = ''.join(stderr_tail)
+    if filename is None:
+        filename = extract_filename_from_output('', stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, ''.join(stdout_tail), stderr), filename
+
+
+def parse_number(value):
+    """Cislo z radku PROGRESS_TEMPLATE ('NA' = hodnota neni znama -> None)."""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def send_progress(request_id, downloaded, total, speed, eta, strategy_desc=None):
+    """Posle extension zpravu o prubehu stahovani."""
+    try:
+        send_message({
+            'requestId': request_id,
+            'type': 'progress',
+            'downloaded': downloaded,
+            'total': total,
+            'percent': round(downloaded / total * 100, 1) if downloaded and total else None,
+            'speed': speed,
+            'eta': eta,
+            'strategy': strategy_desc,
+        })
+    except OSError:
+        # Extension uz spojeni zavrela
+        pass
+
+
+class YtdlpLogger:
+    """Logger pro yt-dlp v procesu hostu - stdout patri Native Messaging
+    protokolu, takze nic nesmi jit na stdout; chyby jdou na stderr."""
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        sys.stderr.write(msg + '\n')
+
+
+def player_client_args(player_client):
+    """Prevede '--extractor-args' strategie na extractor_args pro YoutubeDL.
+
+    'youtube:player_client=tv' -> {'youtube': {'player_client': ['tv']}}
+    """
+    if not player_client:
+        return {}
+    extractor, _, args = player_client.partition(':')
+    key, _, value = args.partition('=')
+    return {extractor: {key: value.split(',')}}
+
+
+def handle_download_inprocess(message):
+    """Stahne video/audio pomoci yt-dlp modulu primo v procesu hostu.
+
+    Stejne strategie jako handle_download(), ale bez spousteni procesu:
+    modul se importuje jednou a vsechny strategie bezi na jedne instanci
+    YoutubeDL - mezi pokusy se meni jen format a player client, takze
+    dalsi pokus vyuzije uz nactene extractory a jejich cache.
+    """
+    url = message.get('url')
+    format_type = message.get('format', 'video')  # video nebo audio
+    quality = message.get('quality', 'best')
+    audio_format = message.get('audioFormat')
+    ffmpeg_path = message.get('ffmpegPath', '')
+    use_cookies = message.get('useCookies', True)
+    request_id = message.get('requestId')
+
+    if not url:
+        return {'success': False, 'error': 'URL neni zadana'}
+
+    # Kanonicka watch URL - bez playlist/tracking parametru
+    video_id = extract_video_id(url)
+    if video_id:
+        url = f'https://www.youtube.com/watch?v={video_id}'
+
+    output_dir = get_download_dir()
+    deadline = time.monotonic() + DOWNLOAD_TIMEOUT
+    progress = {'last_sent': 0.0, 'strategy': None}
+
+    def progress_hook(d):
+        if time.monotonic() > deadline:
+            raise yt_dlp.utils.DownloadCancelled('Timeout')
+        if d['status'] != 'downloading' or request_id is None:
+            return
+        now = time.monotonic()
+        if now - progress['last_sent'] < PROGRESS_INTERVAL:
+            return
+        progress['last_sent'] = now
+        send_progress(
+            request_id,
+            d.get('downloaded_bytes'),
+            d.get('total_bytes') or d.get('total_bytes_estimate'),
+            d.get('speed'),
+            d.get('eta'),
+            progress['strategy'],
+        )
+
+    ydl_opts = {
+        'outtmpl': os.path.join(output_dir, '%(title).150s.%(ext)s'),
+        'noplaylist': True,
+        'nocheckcertificate': True,
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'logger': YtdlpLogger(),
+        'progress_hooks': [progress_hook],
+    }
+
+    # Cookies - pouzit JEN kdyz je extension explicitne posle
+    cookies_from_ext = message.get('cookies')
+    if use_cookies and cookies_from_ext:
+        cookies_path = get_cookies_path(cookies_from_ext)
+        if cookies_path:
+            ydl_opts['cookiefile'] = cookies_path
+
+    postprocessors = []
+    if format_type == 'audio' or audio_format:
+        if audio_format in ['mp3', 'wav', 'flac', 'ogg', 'm4a', 'aac']:
+            postprocessors.append({
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': audio_format,
+                'preferredquality': '0',  # Nejlepsi kvalita
+            })
+    else:
+        postprocessors.append({'key': 'FFmpegVideoRemuxer', 'preferedformat': 'mp4'})
+    if postprocessors:
+        ydl_opts['postprocessors'] = postprocessors
+        ffmpeg = find_tool('ffmpeg', ffmpeg_path, DEFAULT_FFMPEG_PATHS)
+        if ffmpeg['available'] and os.path.dirname(ffmpeg['path']):
+            ydl_opts['ffmpeg_location'] = os.path.dirname(ffmpeg['path'])
+
+    error_msg = 'Neznama chyba'
+    strategy_index = 0
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            for strategy_index, strategy in enumerate(RETRY_STRATEGIES):
+                strategy_desc = strategy.get('description', f'Strategy {strategy_index}')
+                progress['strategy'] = strategy_desc
+
+                # Zmena parametru existujici instance - extractory zustavaji nactene
+                ydl.params['format'] = strategy_format_selector(strategy, format_type, quality, audio_format)
+                if hasattr(ydl, 'format_selector'):
+                    # Novejsi yt-dlp si selector sestavi uz v __init__
+                    ydl.format_selector = ydl.build_format_selector(ydl.params['format'])
+                ydl.params['extractor_args'] = player_client_args(strategy.get('player_client'))
+                if format_type != 'audio' and not audio_format and strategy.get('format_video') not in ['best', 'b']:
+                    ydl.params['merge_output_format'] = 'mp4'
+                else:
+                    ydl.params.pop('merge_output_format', None)
+
+                try:
+                    info = ydl.extract_info(url, download=True)
+                except yt_dlp.utils.DownloadCancelled:
+                    return {'success': False, 'error': 'Stahovani trvalo prilis dlouho. Zkuste nizsi kvalitu.'}
+                except Exception as e:
+                    error_msg = str(e) or 'Neznama chyba'
+                    if strategy_index + 1 < len(RETRY_STRATEGIES) and should_retry_error(error_msg):
+                        time.sleep(RETRY_DELAY)
+                        continue
+                    break
+
+                downloads = info.get('requested_downloads') or [{}]
+                filename = downloads[0].get('filepath') or info.get('filepath')
+                return {
+                    'success': True,
+                    'filename': os.path.basename(filename) if filename else 'video.mp4',
+                    'filepath': filename or output_dir,
+                    'strategy_used': strategy_index,
+                    'strategy_desc': strategy_desc,
+                }
+    finally:
+        # Host bezi dlouho - cookies nenechavat na disku do jeho ukonceni
+        remove_temp_cookies(ydl_opts.get('cookiefile'))
+
+    # Parsovat uzivatelsky pritelive chybove hlasky
+    friendly_error = parse_error_message(error_msg)
+    strategies_tried = strategy_index + 1
+    if strategies_tried > 1:
+        friendly_error += f' (vyzkouseno {strategies_tried} strategii)'
+
+    return {
+        'success': False,
+        'error': friendly_error,
+        'raw_error': error_msg[:300].replace('\n', ' ').strip(),
+        'returncode': None,
+        'strategies_tried': strategies_tried,
+        'last_strategy': strategy_desc,
+    }
 
 
 def extract_filename_from_output(stdout, stderr):
@@ -729,79 +1201,137 @@ def parse_error_message(error_msg):
 # HLAVNI LOOP
 # ============================================================================
 
-def main():
-    """Hlavni funkce - zpracovava zpravy od extension."""
+def handle_message(message):
+    """Zpracuje jednu zpravu od extension a vrati odpoved."""
+    action = message.get('action')
+
+    if action == 'check':
+        return handle_check(message)
+    elif action == 'test':
+        return handle_test(message)
+    elif action == 'download':
+        return handle_download(message)
+    elif action == 'checkYtdlpUpdate':
+        # Zkontrolovat dostupnost aktualizace yt-dlp
+        ytdlp_path = message.get('ytdlpPath', '')
+        installed = get_installed_ytdlp_version(ytdlp_path)
+        latest = get_latest_ytdlp_version()
+
+        if installed:
+            current_ver, current_path = installed
+        else:
+            current_ver, current_path = None, None
+
+        result = {
+            'success': True,
+            'installed': current_ver,
+            'latest': latest,
+            'path': current_path,
+            'updateAvailable': bool(latest and current_ver and latest != current_ver)
+        }
+        if use_inprocess(message):
+            # Stahuje se modulem - jeho verze je ta, ktera se skutecne pouziva
+            result['module'] = yt_dlp.version.__version__
+        return result
+    elif action == 'updateYtdlp':
+        # Aktualizovat yt-dlp
+        ytdlp_path = message.get('ytdlpPath', '')
+
+        # Najit aktualni cestu k yt-dlp
+        installed = get_installed_ytdlp_version(ytdlp_path)
+        if installed:
+            _, target_path = installed
+        else:
+            target_path = None
+
+        result = download_ytdlp_update(target_path)
+        if use_inprocess(message):
+            # Modul v procesu hostu se timto neaktualizuje
+            result['warning'] = (
+                f'Stahovani bezi pres yt-dlp modul {yt_dlp.version.__version__}, '
+                'ktery aktualizace binarky nemeni (pip install -U yt-dlp)'
+            )
+        return result
+    elif action == 'ping':
+        return {
+            'success': True,
+            'version': VERSION,
+        }
+    else:
+        return {
+            'success': False,
+            'error': f'Neznama akce: {action}'
+        }
 
-    while True:
-        try:
-            message = read_message()
-        except Exception:
-            break
+def handle_tagged_message(message):
+    """Zpracuje zpravu s requestId ve vlakne a odpoved oznaci stejnym requestId."""
+    request_id = message.get('requestId')
+    try:
+        result = handle_message(message)
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e)[:200]
+        }
+    result = dict(result, requestId=request_id)
+    try:
+        send_message(result)
+    except OSError:
+        # Extension uz spojeni zavrela
+        pass
 
-        if message is None:
-            break
+def main():
+    """Hlavni funkce - zpracovava zpravy od extension.
+
+    Zpravy s 'requestId' (trvale spojeni pres connectNative) se zpracuji
+    soubezne a odpoved kazde z nich se posle, jakmile je hotova - host
+    bezi dal a dalsi stahovani uz neplati start interpretu ani hledani
+    nastroju. Dlouhe akce (LONG_ACTIONS) sdili MAX_PARALLEL_REQUESTS
+    vlaken, ostatni maji vlastni pool a ping se odpovi hned ve cteci
+    smycce - ani pri plne obsazenem stahovani necekaji minuty. Zpravy
+    bez 'requestId' (sendNativeMessage) se zpracuji postaru: postupne
+    a po stazeni se host ukonci.
+    """
+    pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS)
+    quick_pool = ThreadPoolExecutor(max_workers=QUICK_WORKERS)
 
-        action = message.get('action')
+    try:
+        while True:
+            try:
+                message = read_message()
+            except Exception:
+                break
 
-        try:
-            if action == 'check':
-                result = handle_check(message)
-            elif action == 'test':
-                result = handle_test(message)
-            elif action == 'download':
-                result = handle_download(message)
-            elif action == 'checkYtdlpUpdate':
-                # Zkontrolovat dostupnost aktualizace yt-dlp
-                ytdlp_path = message.get('ytdlpPath', '')
-                installed = get_installed_ytdlp_version(ytdlp_path)
-                latest = get_latest_ytdlp_version()
-
-                if installed:
-                    current_ver, current_path = installed
-                else:
-                    current_ver, current_path = None, None
+            if message is None:
+                break
 
-                result = {
-                    'success': True,
-                    'installed': current_ver,
-                    'latest': latest,
-                    'path': current_path,
-                    'updateAvailable': bool(latest and current_ver and latest != current_ver)
-                }
-            elif action == 'updateYtdlp':
-                # Aktualizovat yt-dlp
-                ytdlp_path = message.get('ytdlpPath', '')
-
-                # Najit aktualni cestu k yt-dlp
-                installed = get_installed_ytdlp_version(ytdlp_path)
-                if installed:
-                    _, target_path = installed
+            if message.get('requestId') is not None:
+                if message.get('action') == 'ping':
+                    handle_tagged_message(message)
+                elif message.get('action') in LONG_ACTIONS:
+                    pool.submit(handle_tagged_message, message)
                 else:
-                    target_path = None
+                    quick_pool.submit(handle_tagged_message, message)
+                continue
 
-                result = download_ytdlp_update(target_path)
-            elif action == 'ping':
-                result = {
-                    'success': True,
-                    'version': VERSION,
-                }
-            else:
-                result = {
-                    'success': False,
-                    'error': f'Neznama akce: {action}'
-                }
+            action = message.get('action')
 
-            send_message(result)
+            try:
+                send_message(handle_message(message))
 
-            # Po stazeni ukoncit
-            if action == 'download':
-                break
+                # Po stazeni ukoncit
+                if action == 'download':
+                    break
 
-        except Exception as e:
-            send_message({
-                'success': False,
-                'error': str(e)[:200]
-            })
+            except Exception as e:
+                send_message({
+                    'success': False,
+                    'error': str(e)[:200]
+                })
+    finally:
+        # Dokoncit rozpracovane pozadavky pred ukoncenim
+        quick_pool.shutdown(wait=True)
+        pool.shutdown(wait=True)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Testy yt_server.py.
+
+Zátěžový test stavu úloh: několik vláken zapisuje přes update_task()
+a další vlákna současně čtou TaskRecord.snapshot() a TaskRecord.to_dict().
+Každý zápis nastaví skupinu polí odvozených z jednoho čísla, takže
+čtenář pozná rozepsaný (smíšený) stav. Test ověřuje, že žádný čtenář
+nikdy neuvidí smíšený stav a že pořadové číslo verze (seq) nikdy neklesne.
+
+Video ID: VIDEO_ID_RE/extract_video_id ze serveru, CLI
+(youtube_downloader.py) i native hostu musí dávat stejné výsledky
+a shodovat se s původním parsováním přes urlparse/parse_qs. CLI a native
+host se neimportují (CLI bez yt-dlp skončí) - z jejich zdrojáku se vezme
+jen regex a funkce. Měření rychlosti (timeit) je volitelné - výsledek
+závisí na zátěži stroje.
+
+Spuštění:
+    python test_yt_server.py
+    python -m pytest test_yt_server.py
+    python test_yt_server.py --bench    # jen benchmark video ID
+    YT_BENCH=1 python -m pytest test_yt_server.py   # včetně testu rychlosti
+"""
+
+import ast
+import os
+import sys
+import threading
+import time
+import timeit
+import unittest
+from urllib.parse import urlparse, parse_qs
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SERVER_DIR)
+sys.path.insert(0, SERVER_DIR)
+
+import yt_server
+
+# ============================================================================
+# NASTAVENÍ
+# ============================================================================
+
+WRITERS = 4
+READERS = 4
+UPDATES_PER_WRITER = 20000
+BASE_TIME = 1_000_000.0
+
+def state_fields(writer, n):
+    """Pole jednoho zápisu - všechna odvozená z (writer, n)."""
+    value = writer * UPDATES_PER_WRITER + n
+    return {
+        'status': 'downloading',
+        'progress': value,
+        'speed': value * 10,
+        'eta': -value,
+        'filename': f'{writer}-{n}.mp4',
+        'first_byte_at': BASE_TIME + value,
+        'download_finished_at': BASE_TIME + value + 2,
+    }
+
+def check_consistent(data):
+    """Vrátí popis chyby, pokud pole stavu nepatří k jednomu zápisu."""
+    if data['filename'] is None:
+        return None  # Ještě žádný zápis
+    writer, n = (int(x) for x in data['filename'][:-len('.mp4')].split('-'))
+    expected = state_fields(writer, n)
+    for key, value in expected.items():
+        if data[key] != value:
+            return f'{key}={data[key]!r}, očekáváno {value!r} (zápis {writer}-{n})'
+    return None
+
+# Kopie video ID matcheru (viz docstring modulu)
+MATCHER_COPIES = {
+    'server': os.path.join(SERVER_DIR, 'yt_server.py'),
+    'cli': os.path.join(PROJECT_DIR, 'youtube_downloader.py'),
+    'native-host': os.path.join(PROJECT_DIR, 'native-host', 'adhub_yt_host.py'),
+}
+
+BENCH_URLS = [
+    'dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs&index=3',
+    'https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42s',
+    'https://m.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://music.youtube.com/watch?v=dQw4w9WgXcQ&si=abcdef',
+    'https://youtu.be/dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ?t=10',
+    'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+    'https://www.youtube.com/embed/dQw4w9WgXcQ?autoplay=1',
+    'https://www.youtube.com/v/dQw4w9WgXcQ',
+    'https://www.youtube.com/playlist?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs',
+    'https://example.com/watch?v=dQw4w9WgXcQ',
+    'not a url',
+]
+
+def legacy_extract_video_id(url):
+    """Původní extract_video_id() ze serveru (před VIDEO_ID_RE)."""
+    if not url:
+        return None
+
+    # Přímé video ID
+    if len(url) == 11 and url.isalnum():
+        return url
+
+    try:
+        parsed = urlparse(url)
+
+        # youtube.com/watch?v=XXX
+        if 'youtube.com' in parsed.netloc:
+            qs = parse_qs(parsed.query)
+            if 'v' in qs:
+                return qs['v'][0]
+            # /shorts/XXX nebo /embed/XXX
+            path_parts = parsed.path.split('/')
+            for i, part in enumerate(path_parts):
+                if part in ['shorts', 'embed', 'v'] and i + 1 < len(path_parts):
+                    return path_parts[i + 1]
+
+        # youtu.be/XXX
+        if 'youtu.be' in parsed.netloc:
+            return parsed.path.strip('/')
+
+    except Exception:
+        pass
+
+    return None
+
+def load_matcher(path):
+    """Vrátí extract_video_id() ze zdrojáku `path` (jen VIDEO_ID_RE a funkce)."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    wanted = []
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id == 'VIDEO_ID_RE' for t in node.targets):
+            wanted.append(node)
+        elif isinstance(node, ast.FunctionDef) and node.name == 'extract_video_id':
+            wanted.append(node)
+    namespace = {'re': __import__('re')}
+    exec(compile(ast.Module(body=wanted, type_ignores=[]), path, 'exec'), namespace)
+    return namespace['extract_video_id']
+
+def bench(func, number=2000, repeat=5):
+    """Nejlepší čas jednoho volání v mikrosekundách přes BENCH_URLS."""
+    def run():
+        for url in BENCH_URLS:
+            func(url)
+    return min(timeit.repeat(run, number=number, repeat=repeat)) / (number * len(BENCH_URLS)) * 1e6
+
+# ============================================================================
+# TESTY
+# ============================================================================
+
+class TaskRecordStressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.task_id = f'stress-{time.time_ns()}'
+        yt_server.download_tasks.create(self.task_id, status='queued')
+        self.switch_interval = sys.getswitchinterval()
+        # Častější přepínání vláken = víc příležitostí k souběhu
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def test_readers_never_see_torn_state(self):
+        task = yt_server.download_tasks.get(self.task_id)
+        done = threading.Event()
+        errors = []
+        reads = [0] * READERS
+
+        def writer(index):
+            for n in range(UPDATES_PER_WRITER):
+                yt_server.update_task(self.task_id, **state_fields(index, n))
+
+        def reader(index):
+            last_seq = -1
+            while not done.is_set() and not errors:
+                if reads[index] % 2:
+                    data = task.to_dict()
+                    stages = data['stages']
+                    if data['filename'] is not None and stages['download'] != 2:
+                        errors.append(f'stages neodpovídají stavu: {stages}')
+                else:
+                    data = task.snapshot()._asdict()
+                problem = check_consistent(data)
+                if problem:
+                    errors.append(problem)
+                if data['seq'] < last_seq:
+                    errors.append(f'seq kleslo z {last_seq} na {data["seq"]}')
+                last_seq = data['seq']
+                reads[index] += 1
+
+        readers = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+        writers = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertGreater(min(reads), 0)
+        # Žádný zápis se neztratil (zápisy se serializují zámkem)
+        self.assertEqual(task.snapshot().seq, WRITERS * UPDATES_PER_WRITER)
+        self.assertIsNone(check_consistent(task.to_dict()))
+
+
+class VideoIdMatcherTest(unittest.TestCase):
+
+    def test_copies_agree(self):
+        matchers = {name: load_matcher(path) for name, path in MATCHER_COPIES.items()}
+        for url in BENCH_URLS:
+            results = {name: func(url) for name, func in matchers.items()}
+            self.assertEqual(len(set(results.values())), 1, f'{url}: {results}')
+        # Původní parser dává pro platné YouTube URL stejné ID
+        for url in BENCH_URLS[:12]:
+            expected = legacy_extract_video_id(url)
+            if expected and len(expected) == 11:
+                self.assertEqual(matchers['server'](url), expected, url)
+
+    @unittest.skipUnless(os.environ.get('YT_BENCH'), 'měření rychlosti jen s YT_BENCH=1')
+    def test_regex_beats_legacy_parsing(self):
+        legacy = bench(legacy_extract_video_id)
+        for name, path in MATCHER_COPIES.items():
+            with self.subTest(copy=name):
+                # Rezerva pro zašuměné stroje - typicky vychází 4-5x
+                self.assertLess(bench(load_matcher(path)) * 2, legacy)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def run_benchmark():
+    """Vypíše rychlost všech kopií extract_video_id proti původnímu parseru."""
+    legacy = bench(legacy_extract_video_id)
+    print(f'  původní parser:   {legacy:.2f} us/volání')
+    for name, path in MATCHER_COPIES.items():
+        current = bench(load_matcher(path))
+        print(f'  {name + ":":<17} {current:.2f} us/volání ({legacy / current:.1f}x)')
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        run_benchmark()
+    else:
+        unittest.main()
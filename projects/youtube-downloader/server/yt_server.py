@@ -10,21 +10,48 @@ Spuštění:
 
 API Endpoints:
     GET  /api/info?url=YOUTUBE_URL     - Získá info o videu a dostupné formáty
-    POST /api/download                  - Stáhne video/audio
+                                          (&refresh=1 obejde cache metadat)
+    POST /api/info/batch                - Info pro seznam videí (NDJSON stream)
+    GET  /api/playlist?url=URL&page=N   - Videa playlistu/kanálu (stránkovaně)
+    POST /api/playlist/download         - Zařadí celý playlist do fronty
+    POST /api/download                  - Zařadí stažení video/audio do fronty
+    POST /api/cancel/<task_id>          - Zruší čekající/běžící stahování
+    GET  /api/ratelimit                 - Globální limit rychlosti (B/s)
+    POST /api/ratelimit                 - Změní globální limit rychlosti za běhu
     GET  /api/status                    - Stav serveru
     GET  /api/progress/<task_id>        - Průběh stahování
+    GET  /api/progress/<task_id>/stream - Průběh stahování jako SSE stream
+    GET  /api/file/<task_id>            - Stažený soubor (podporuje Range)
+    GET  /api/stream/<task_id>          - Soubor přeposílaný už během stahování
+                                          (jen úlohy s "live": true)
+    GET  /api/events                    - SSE stream průběhu všech úloh
+    GET  /api/stats                     - Souhrnné doby fází stahování (fronta,
+                                          extrakce, síť, ffmpeg)
+    GET  /metrics                       - Metriky ve formátu Prometheus
 """
 
 import os
+import re
 import sys
 import json
+import copy
+import hashlib
+import mimetypes
+import shutil
+import heapq
+import itertools
+import math
 import uuid
 import threading
 import time
+from collections import OrderedDict, deque, namedtuple
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate
+from urllib.parse import urlparse, parse_qs, unquote, quote
 import subprocess
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 # Pokusit se importovat yt-dlp
 try:
@@ -45,50 +72,1178 @@ CONFIG = {
     'DOWNLOAD_DIR': os.path.expanduser('~/Downloads'),
     'CORS_ORIGINS': ['*'],  # Povolit všechny origins pro lokální použití
     'DEBUG': True,
+    'MAX_CONNECTIONS': 32,  # Max. počet současně obsluhovaných HTTP požadavků
+    'MAX_STREAMS': 64,      # Max. počet otevřených streamů (SSE, /api/stream, /api/file)
+    'INFO_CACHE_TTL': 600,  # Platnost metadat videa v cache (sekundy)
+    'INFO_CACHE_SIZE': 128, # Max. počet videí v cache metadat
+    'MAX_CONCURRENT_DOWNLOADS': 3,  # Max. počet současně běžících stahování
+    'SSE_MIN_INTERVAL': 0.05,       # Min. odstup událostí v jednom SSE streamu (sekundy)
+    'SSE_KEEPALIVE': 15,            # Interval keep-alive komentářů SSE (sekundy)
+    'TASK_MAX_ENTRIES': 500,        # Max. počet úloh držených v paměti
+    'TASK_MAX_AGE': 3600,           # Dokončené úlohy starší než N sekund se vyřadí z paměti
+    'TASK_DB_PATH': os.path.join(os.path.expanduser('~'), '.adhub', 'yt_server.db'),
+                                    # SQLite s historií a žurnálem úloh (None = vypnuto)
+    'RESUME_ON_START': True,        # Po startu znovu zařadit nedokončená stahování ze žurnálu
+    'DEDUPE_CACHE_DIR': os.path.join(os.path.expanduser('~'), '.adhub', 'yt_cache'),
+                                    # Cache stažených souborů pro opakované požadavky (None = vypnuto)
+    'DEDUPE_CACHE_MAX_BYTES': 20 * 1024 ** 3,  # Max. velikost cache stažených souborů
+    'DEDUPE_COPY_WORKERS': 2,       # Počet současných kopií z cache stažených souborů
+    'BATCH_WORKERS': 8,             # Počet souběžných extrakcí pro /api/info/batch
+    'BATCH_MAX_URLS': 200,          # Max. počet URL v jednom dávkovém požadavku
+    'PLAYLIST_PAGE_SIZE': 50,       # Výchozí počet položek na stránku /api/playlist
+    'PLAYLIST_MAX_ENTRIES': 5000,   # Max. počet načtených položek playlistu/kanálu
+    'LIVE_STREAM_WAIT': 300,        # Jak dlouho /api/stream čeká na začátek stahování (sekundy)
+    'LIVE_STREAM_CHUNK': 256 * 1024,  # Velikost bloku při přeposílání rozpracovaného souboru
+    'FRAGMENTS': 'auto',            # Počet paralelně stahovaných fragmentů (číslo nebo 'auto')
+    'FRAGMENTS_DEFAULT': 4,         # Výchozí počet fragmentů, dokud není co měřit
+    'FRAGMENTS_MAX': 16,            # Horní mez pro 'auto'
+    'HTTP_CHUNK_SIZE': 10 * 1024 * 1024,  # Velikost HTTP bloku (range požadavku) v bajtech -
+                                    # jen pro nefragmentované formáty (live, progresivní);
+                                    # DASH fragmenty ('dashy') ji ignorují
+    'LINK_BANDWIDTH': None,         # Propustnost linky v B/s (None = odhad z měření)
+    'PARALLEL_STREAMS': True,       # Stahovat video a audio stopu současně a pak sloučit
+    'RATE_LIMIT': None,             # Globální limit rychlosti všech stahování v B/s (None = bez limitu)
+    'TASK_RATE_LIMIT': None,        # Výchozí limit rychlosti jedné úlohy v B/s (None = bez limitu)
+    'AUDIO_WORKERS': os.cpu_count() or 1,  # Počet současných konverzí audia (ffmpeg procesů)
+    'FFMPEG_PATH': 'ffmpeg',        # Cesta k ffmpeg pro konverzi audia
 }
 
-# Stav stahování
-download_tasks = {}
+# YouTube adaptivní formáty jsou jediné https URL stahované sekvenčně po
+# blocích. 'dashy' z nich udělá DASH fragmenty, které yt-dlp umí stahovat
+# paralelně (concurrent_fragment_downloads).
+FRAGMENTED_EXTRACTOR_ARGS = {'youtube': {'formats': ['dashy']}}
+
+# Konverze audia: výběr zdrojového formátu, ffmpeg enkodér a jeho
+# parametry, počet vláken ffmpeg na jednu konverzi (paralelismus dává
+# hlavně AUDIO_WORKERS) a zdrojové kodeky, které stačí jen přebalit
+# (-c:a copy) nebo nechat beze změny.
+AUDIO_PRESETS = {
+    'mp3': {
+        'format': 'bestaudio/best',
+        'ext': 'mp3',
+        'codec': 'libmp3lame',
+        'args': ['-b:a', '320k'],
+        'threads': 1,
+        'copy_codecs': ('mp3',),
+    },
+    'wav': {
+        'format': 'bestaudio/best',
+        'ext': 'wav',
+        'codec': 'pcm_s16le',
+        'args': [],
+        'threads': 1,
+        'copy_codecs': (),
+    },
+    'm4a': {
+        'format': 'bestaudio[ext=m4a]/bestaudio/best',
+        'ext': 'm4a',
+        'codec': 'aac',
+        'args': ['-b:a', '256k'],
+        'threads': 1,
+        'copy_codecs': ('aac',),
+    },
+    'flac': {
+        'format': 'bestaudio/best',
+        'ext': 'flac',
+        'codec': 'flac',
+        'args': ['-compression_level', '5'],
+        'threads': 1,
+        'copy_codecs': ('flac',),
+    },
+    'ogg': {
+        # Opus i Vorbis z YouTube jdou do Ogg bez překódování
+        'format': 'bestaudio[acodec=opus]/bestaudio[acodec=vorbis]/bestaudio/best',
+        'ext': 'ogg',
+        'codec': 'libvorbis',
+        'args': ['-q:a', '10'],
+        'threads': 1,
+        'copy_codecs': ('opus', 'vorbis'),
+    },
+}
+
+# ============================================================================
+# ÚLOHY STAHOVÁNÍ
+# ============================================================================
+
+TERMINAL_STATES = ('completed', 'error', 'cancelled')
+
+TASK_FIELDS = (
+    'task_id',
+    'seq',                 # Pořadové číslo verze stavu (roste s každou změnou)
+    'status',
+    'queue_position',      # Počítá se až při čtení (scheduler.position())
+    'priority',
+    'progress',
+    'speed',
+    'eta',
+    'filename',
+    'filepath',
+    'error',
+    'info_source',         # 'cache' nebo 'extract'
+    'created_at',
+    'started_at',
+    'finished_at',
+    'time_to_first_byte',  # Sekundy od startu do prvních stažených bajtů
+    'extract_started_at',  # Začátek extrakce metadat (None = metadata z cache)
+    'extract_finished_at',
+    'first_byte_at',       # První stažené bajty
+    'download_finished_at',  # Konec stahování posledního souboru/stopy
+    'postprocess_finished_at',  # Konec slučování/konverze ffmpeg
+    'live',                # Jednosouborový formát, lze sledovat přes /api/stream
+    'partial_path',        # Rozpracovaný soubor (.part), do kterého yt-dlp zapisuje
+    'fragments',           # Počet paralelně stahovaných fragmentů
+    'chunk_size',          # Velikost HTTP bloku v bajtech (jen nefragmentované formáty)
+    'rate_limit',          # Limit rychlosti této úlohy v B/s
+    'resumed',             # Úloha obnovena ze žurnálu po restartu serveru
+    'dedupe_hit',          # Soubor vydán z cache stažených souborů bez stahování
+)
+
+TaskState = namedtuple('TaskState', TASK_FIELDS, defaults=(None,) * len(TASK_FIELDS))
+
+# Fáze úlohy: (název, pole začátku, pole konce). Začátek je první
+# vyplněné pole z n-tice - fáze navazují, i když některá chybí
+# (např. extrakce při metadatech z cache).
+TASK_STAGES = (
+    ('queue', ('created_at',), 'started_at'),
+    ('extraction', ('extract_started_at',), 'extract_finished_at'),
+    ('first_byte', ('extract_finished_at', 'started_at'), 'first_byte_at'),
+    ('download', ('first_byte_at',), 'download_finished_at'),
+    ('postprocess', ('download_finished_at',), 'postprocess_finished_at'),
+    ('total', ('created_at',), 'finished_at'),
+)
+
+def stage_durations(state):
+    """Doby jednotlivých fází úlohy v sekundách (None = fáze neproběhla)."""
+    durations = {}
+    for name, start_fields, end_field in TASK_STAGES:
+        start = next((getattr(state, f) for f in start_fields if getattr(state, f) is not None), None)
+        end = getattr(state, end_field)
+        durations[name] = round(end - start, 3) if start is not None and end is not None else None
+    return durations
+
+class StageStats:
+    """
+    Souhrn dob fází dokončených úloh (posledních `window` úloh) pro /api/stats.
+    Ukáže, zda pomalost způsobuje fronta, extrakce, síť nebo ffmpeg.
+    """
+
+    def __init__(self, window=1000):
+        self._samples = {name: deque(maxlen=window) for name, _, _ in TASK_STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, state):
+        durations = stage_durations(state)
+        with self._lock:
+            for name, value in durations.items():
+                if value is not None:
+                    self._samples[name].append(value)
+
+    def stats(self):
+        result = {}
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+        for name, values in samples.items():
+            if not values:
+                result[name] = {'count': 0}
+                continue
+            result[name] = {
+                'count': len(values),
+                'mean': round(sum(values) / len(values), 3),
+                'p50': values[len(values) // 2],
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'max': values[-1],
+            }
+        return result
+
+stage_stats = StageStats()
+
+class TaskRecord:
+    """
+    Stav jedné úlohy stahování.
+
+    Stav je neměnný TaskState (namedtuple). Zápis vytvoří novou verzi a
+    vymění referenci jediným přiřazením, takže čtenáři (HTTP vlákna)
+    nikdy nečekají na zámek a nikdy neuvidí rozepsaný stav - vždy dostanou
+    celou starou, nebo celou novou verzi. Zápisy se serializují společným
+    zámkem, aby se souběžné aktualizace (progress hook, fronta, zrušení)
+    navzájem nepřepsaly.
+    """
+
+    __slots__ = ('_state',)
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, task_id, **fields):
+        state = TaskState(task_id=task_id, seq=0, status='queued', progress=0,
+                          priority=0, created_at=time.time())
+        self._state = state._replace(**fields)
+
+    def __getattr__(self, name):
+        # Volá se jen pro jména mimo __slots__ - čtení pole aktuálního stavu
+        try:
+            return getattr(object.__getattribute__(self, '_state'), name)
+        except AttributeError:
+            raise AttributeError(name) from None
+
+    def update(self, **fields):
+        with self._write_lock:
+            state = self._state
+            self._state = state._replace(seq=state.seq + 1, **fields)
+
+    def snapshot(self):
+        """Vrátí aktuální neměnný stav (TaskState)."""
+        return self._state
+
+    def to_dict(self):
+        state = self._state
+        data = state._asdict()
+        data['queue_position'] = scheduler.position(state.task_id)
+        data['stages'] = stage_durations(state)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        fields = {k: v for k, v in data.items() if k in TASK_FIELDS and k != 'task_id'}
+        return cls(data['task_id'], **fields)
+
+class TaskStore:
+    """
+    Registr úloh stahování s omezenou velikostí.
+
+    Běžící a čekající úlohy zůstávají v paměti vždy. Dokončené úlohy
+    (TERMINAL_STATES) se vyřadí, jakmile jsou starší než `max_age` sekund
+    nebo když počet záznamů překročí `max_entries` (nejstarší první).
+    Je-li zadán `db_path` (nebo zavoláno open_db()), ukládají se dokončené
+    úlohy do SQLite a get() je po vyřazení z paměti (i po restartu) načte
+    odtud. Do stejné databáze se žurnálují parametry nedokončených úloh,
+    aby je šlo po restartu serveru znovu zařadit (viz
+    resume_unfinished_downloads()).
+    """
+
+    def __init__(self, max_entries, max_age, db_path=None):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._records = {}
+        self._finished = OrderedDict()  # task_id -> finished_at, v pořadí dokončení
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self.open_db(db_path)
+
+    def open_db(self, db_path):
+        """Otevře (a případně vytvoří) SQLite databázi úloh."""
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'task_id TEXT PRIMARY KEY, status TEXT, finished_at REAL, data TEXT)'
+        )
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS journal ('
+            'task_id TEXT PRIMARY KEY, created_at REAL, options TEXT)'
+        )
+        db.commit()
+        with self._lock:
+            self._db = db
+
+    def journal(self, task_id, options):
+        """Zapíše parametry rozpracované úlohy do žurnálu."""
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO journal (task_id, created_at, options) VALUES (?, ?, ?)',
+                (task_id, time.time(), json.dumps(options)),
+            )
+            self._db.commit()
+
+    def journal_many(self, entries):
+        """Zapíše [(task_id, options)] do žurnálu jednou transakcí."""
+        if self._db is None or not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO journal (task_id, created_at, options) VALUES (?, ?, ?)',
+                [(task_id, now, json.dumps(options)) for task_id, options in entries],
+            )
+            self._db.commit()
+
+    def journaled(self):
+        """Vrátí [(task_id, options)] nedokončených úloh v pořadí zadání."""
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT task_id, options FROM journal ORDER BY created_at, rowid'
+            ).fetchall()
+        return [(task_id, json.loads(options)) for task_id, options in rows]
+
+    def create(self, task_id, **fields):
+        record = TaskRecord(task_id, **fields)
+        with self._lock:
+            self._records[task_id] = record
+            self._evict()
+        return record
+
+    def get(self, task_id, default=None):
+        record = self._records.get(task_id)
+        if record is not None:
+            return record
+        if self._db is None:
+            return default
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data FROM tasks WHERE task_id = ?', (task_id,)
+            ).fetchone()
+        return TaskRecord.from_dict(json.loads(row[0])) if row else default
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def mark_finished(self, record):
+        """Zaznamená dokončení úlohy, uloží ji do SQLite a provede úklid."""
+        state = record.snapshot()
+        with self._lock:
+            if state.task_id not in self._records:
+                return
+            self._finished[state.task_id] = state.finished_at or time.time()
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO tasks (task_id, status, finished_at, data) '
+                    'VALUES (?, ?, ?, ?)',
+                    (state.task_id, state.status, state.finished_at,
+                     json.dumps(state._asdict())),
+                )
+                self._db.execute('DELETE FROM journal WHERE task_id = ?', (state.task_id,))
+                self._db.commit()
+            self._evict()
+
+    def _evict(self):
+        cutoff = time.time() - self.max_age
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= cutoff and len(self._records) <= self.max_entries:
+                break
+            del self._finished[task_id]
+            self._records.pop(task_id, None)
+            progress_broker.forget(task_id)
+
+# Databáze (TASK_DB_PATH) se otevře až v run_server() - import modulu
+# nic nevytváří v domovské složce
+download_tasks = TaskStore(CONFIG['TASK_MAX_ENTRIES'], CONFIG['TASK_MAX_AGE'])
+
+# ============================================================================
+# CACHE METADAT
+# ============================================================================
+
+class MetadataCache:
+    """
+    Cache výsledků extrakce yt-dlp s TTL a LRU vyřazováním.
+
+    Klíčem je video ID (výstup extract_video_id()). Záznamy starší než `ttl`
+    sekund se považují za neplatné, při překročení `max_size` se vyřadí
+    nejdéle nepoužitý záznam. Bezpečné pro použití z více vláken.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Jako get(), ale nezapočítá se do hits/misses (interní čtení)."""
+        with self._lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            }
+
+info_cache = MetadataCache(CONFIG['INFO_CACHE_TTL'], CONFIG['INFO_CACHE_SIZE'])
+
+# ============================================================================
+# CACHE STAŽENÝCH SOUBORŮ
+# ============================================================================
+
+class DedupeCache:
+    """
+    Obsahově adresovaná cache hotových souborů.
+
+    Klíčem je (video ID, výběr formátu, nastavení postprocesorů), hodnotou
+    soubor uložený v `cache_dir/objects/<sha256><přípona>`. Do cache se
+    soubor dostane hardlinkem (nezabírá místo navíc), jinak kopií.
+    Opakovaný požadavek se vyřídí bez stahování. Levná cesta (lookup()
+    a link() - index, stat, hardlink) běží přímo v HTTP vlákně a úloha
+    je hned hotová. Pomalá cesta copy() (SHA-256 existujícího souboru,
+    reflink/kopie) běží v dedupe_pool, mimo HTTP vlákno i sloty fronty.
+    Při překročení `max_bytes` se mažou nejdéle nepoužité soubory.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._objects = os.path.join(cache_dir, 'objects')
+        os.makedirs(self._objects, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, sha256 TEXT, filename TEXT, size INTEGER, '
+            'mtime_ns INTEGER, last_used REAL)'
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(video_id, ydl_opts, audio_format=None):
+        """Klíč z parametrů, které ovlivňují obsah výsledného souboru."""
+        relevant = {
+            'video_id': video_id,
+            'format': ydl_opts.get('format'),
+            'postprocessors': ydl_opts.get('postprocessors') or [],
+            'merge_output_format': ydl_opts.get('merge_output_format'),
+            'audio': AUDIO_PRESETS[audio_format] if audio_format else None,
+        }
+        return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+    def lookup(self, key):
+        """
+        Vrátí platný záznam pro `key` jako (blob, filename, size, sha256),
+        nebo None. Jen dotaz do indexu a stat - levné i v HTTP vlákně.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT sha256, filename, size, mtime_ns FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            sha256, filename, size, mtime_ns = row
+            blob = self._blob_path(sha256, filename)
+            try:
+                st = os.stat(blob)
+            except OSError:
+                st = None
+            # Soubor změněný mimo cache (sdílený hardlink) už neodpovídá hashi
+            if st is None or st.st_size != size or st.st_mtime_ns != mtime_ns:
+                self._drop(key, sha256, filename)
+                self.misses += 1
+                return None
+            self._db.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        return blob, filename, size, sha256
+
+    def link(self, entry, output_dir):
+        """
+        Levné vydání záznamu z lookup() do `output_dir`: cílový soubor už
+        je tentýž soubor (hardlink blobu), nebo na jeho místo jde vytvořit
+        hardlink. Jinak None - pak je potřeba copy().
+        """
+        blob, filename, _, _ = entry
+        target = os.path.join(output_dir, filename)
+        if os.path.exists(target):
+            try:
+                return target if os.path.samefile(target, blob) else None
+            except OSError:
+                return None
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            os.link(blob, target)
+        except OSError:
+            return None
+        return target
+
+    def copy(self, entry, output_dir):
+        """
+        Pomalé vydání záznamu z lookup() do `output_dir`. Soubor stejného
+        jména se použije, jen pokud má stejný SHA-256; jiný soubor se
+        nepřepíše a kopie dostane volné jméno. Kopie se vytvoří
+        reflinkem, jinak běžným kopírováním (clone_file()).
+        """
+        blob, filename, size, sha256 = entry
+        target = os.path.join(output_dir, filename)
+        name, ext = os.path.splitext(target)
+        for n in itertools.count(2):
+            if not os.path.exists(target):
+                break
+            if os.path.isfile(target) and os.path.getsize(target) == size and (
+                    os.path.samefile(target, blob) or self.file_sha256(target) == sha256):
+                return target
+            # Stejné jméno, jiný obsah - cizí soubor nepřepisovat
+            target = f'{name} ({n}){ext}'
+        os.makedirs(output_dir, exist_ok=True)
+        clone_file(blob, target)
+        return target
+
+    @staticmethod
+    def file_sha256(filepath):
+        """SHA-256 souboru (počítá se po blocích)."""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def store(self, key, filepath):
+        """Uloží hotový soubor do cache."""
+        sha256 = self.file_sha256(filepath)
+        filename = os.path.basename(filepath)
+        blob = self._blob_path(sha256, filename)
+
+        with self._lock:
+            if not os.path.exists(blob):
+                try:
+                    os.link(filepath, blob)
+                except OSError:
+                    shutil.copyfile(filepath, blob)
+            st = os.stat(blob)
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, sha256, filename, size, mtime_ns, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, sha256, filename, st.st_size, st.st_mtime_ns, time.time()),
+            )
+            self._db.commit()
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+    def _blob_path(self, sha256, filename):
+        return os.path.join(self._objects, sha256 + os.path.splitext(filename)[1])
+
+    def _drop(self, key, sha256, filename):
+        self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+        still_used = self._db.execute(
+            'SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1', (sha256,)
+        ).fetchone()
+        if not still_used:
+            try:
+                os.remove(self._blob_path(sha256, filename))
+            except OSError:
+                pass
+        self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            'SELECT key, sha256, filename, size FROM entries ORDER BY last_used'
+        ).fetchall()
+        for key, sha256, filename, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._drop(key, sha256, filename)
+            total -= size
+
+# Vytvoří se v run_server() podle DEDUPE_CACHE_DIR (None = vypnuto)
+dedupe_cache = None
+
+# Kopírování z cache (DedupeCache.copy()) - neblokuje HTTP vlákna ani frontu
+dedupe_pool = ThreadPoolExecutor(max_workers=CONFIG['DEDUPE_COPY_WORKERS'], thread_name_prefix='dedupe')
+
+# ============================================================================
+# UDÁLOSTI PRŮBĚHU (SSE)
+# ============================================================================
+
+class ProgressBroker:
+    """
+    Rozesílá změny stavu úloh odběratelům SSE streamů.
+
+    Každá změna úlohy zvýší globální verzi. Odběratel si pamatuje poslední
+    zpracovanou verzi a po probuzení dostane seznam úloh změněných od té
+    doby - vícenásobné změny jedné úlohy se tak přirozeně slijí do jedné
+    události s aktuálním stavem.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._task_versions = {}
+
+    @property
+    def version(self):
+        return self._version
+
+    def publish(self, task_id):
+        self.publish_many((task_id,))
+
+    def publish_many(self, task_ids):
+        """Ohlásí změnu více úloh najednou (jedno probuzení odběratelů)."""
+        with self._cond:
+            for task_id in task_ids:
+                self._version += 1
+                self._task_versions[task_id] = self._version
+            self._cond.notify_all()
+
+    def forget(self, task_id):
+        with self._cond:
+            self._task_versions.pop(task_id, None)
+
+    def wait(self, since, timeout, task_id=None):
+        """
+        Počká na změnu novější než `since` (nejvýše `timeout` sekund).
+        Vrací (aktuální verze, seznam změněných task_id).
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._has_changes(since, task_id), timeout)
+            if task_id is not None:
+                changed = [task_id] if self._task_versions.get(task_id, 0) > since else []
+            else:
+                changed = [tid for tid, v in self._task_versions.items() if v > since]
+            return self._version, changed
+
+    def _has_changes(self, since, task_id):
+        if task_id is not None:
+            return self._task_versions.get(task_id, 0) > since
+        return self._version > since
+
+progress_broker = ProgressBroker()
+
+def update_task(task_id, **fields):
+    """Aktualizuje stav úlohy a upozorní odběratele průběhu."""
+    task = download_tasks.get(task_id)
+    if task is None:
+        return
+    if fields.get('status') in TERMINAL_STATES:
+        fields.setdefault('finished_at', time.time())
+    task.update(**fields)
+    progress_broker.publish(task_id)
+    if fields.get('status') in TERMINAL_STATES:
+        download_tasks.mark_finished(task)
+        metrics.inc('yt_downloads_finished_total', status=fields['status'])
+        if fields['status'] == 'completed' and not task.dedupe_hit:
+            stage_stats.record(task.snapshot())
+
+# ============================================================================
+# FRONTA STAHOVÁNÍ
+# ============================================================================
+
+class DownloadScheduler:
+    """
+    Omezená fronta stahování s prioritami.
+
+    Najednou běží nejvýše `max_concurrent` úloh, ostatní čekají ve frontě
+    se stavem 'queued'. Vyšší `priority` se spustí dříve, při shodě
+    rozhoduje pořadí zadání (FIFO).
+
+    Pozice ve frontě se neukládá do stavu úloh - position() ji dopočítá
+    při čtení ze seznamu pozic, který se přestaví jen po změně pořadí
+    (start úlohy, zrušení, předběhnutí vyšší prioritou). Běžné zařazení
+    na konec fronty jen připíše novou pozici. Odběratelé průběhu se o
+    posunu dozví jedním publish_many() mimo zámek fronty.
+    """
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._heap = []  # (-priority, seq, task_id, job)
+        self._seq = itertools.count()
+        self._running = set()
+        self._cancelled = set()
+        self._cond = threading.Condition()
+        self._workers = []
+        self._positions = {}       # task_id -> pozice ve frontě (1 = další na řadě)
+        self._positions_valid = True
+        self._priorities = {}      # priorita -> počet čekajících úloh
+
+    def submit(self, task_id, job, priority=0):
+        """Zařadí úlohu do fronty; `job` je funkce bez argumentů."""
+        with self._cond:
+            shifted = self._push(task_id, job, priority)
+            self._ensure_workers()
+            self._cond.notify()
+        if shifted:
+            progress_broker.publish_many(shifted)
+
+    def submit_many(self, jobs):
+        """Zařadí [(task_id, job, priority)] najednou (jeden zámek, jedno ohlášení)."""
+        shifted = set()
+        with self._cond:
+            for task_id, job, priority in jobs:
+                shifted.update(self._push(task_id, job, priority))
+            self._ensure_workers()
+            self._cond.notify_all()
+        if shifted:
+            progress_broker.publish_many(shifted)
+
+    def position(self, task_id):
+        """Pozice čekající úlohy ve frontě (1 = další na řadě), jinak None."""
+        with self._cond:
+            if not self._positions_valid:
+                self._positions = {entry[2]: i for i, entry in enumerate(sorted(self._heap), 1)}
+                self._positions_valid = True
+            return self._positions.get(task_id)
+
+    def _push(self, task_id, job, priority):
+        """Vloží úlohu do haldy; vrátí úlohy, kterým se tím posunula pozice."""
+        heapq.heappush(self._heap, (-priority, next(self._seq), task_id, job))
+        self._priorities[priority] = self._priorities.get(priority, 0) + 1
+        if not any(p < priority for p in self._priorities):
+            # Zařazení na konec fronty - ostatní pozice se nemění
+            if self._positions_valid:
+                self._positions[task_id] = len(self._heap)
+            return []
+        # Předbíhá úlohy s nižší prioritou
+        self._positions_valid = False
+        return [entry[2] for entry in self._heap if -entry[0] < priority]
+
+    def _pop(self, index=0):
+        """Odebere položku haldy; vrátí ji a čekající úlohy, kterým se posunula pozice."""
+        if index == 0:
+            entry = heapq.heappop(self._heap)
+        else:
+            entry = self._heap.pop(index)
+            heapq.heapify(self._heap)
+        priority = -entry[0]
+        self._priorities[priority] -= 1
+        if not self._priorities[priority]:
+            del self._priorities[priority]
+        self._positions_valid = False
+        return entry, [e[2] for e in self._heap if e[:2] > entry[:2]]
+
+    def cancel(self, task_id):
+        """
+        Zruší úlohu. Vrací 'queued' (odebrána z fronty), 'running'
+        (přeruší se při nejbližší aktualizaci průběhu) nebo None.
+        """
+        shifted = None
+        with self._cond:
+            for i, entry in enumerate(self._heap):
+                if entry[2] == task_id:
+                    _, shifted = self._pop(i)
+                    break
+            else:
+                if task_id in self._running:
+                    self._cancelled.add(task_id)
+                    return 'running'
+                return None
+        progress_broker.publish_many(shifted)
+        return 'queued'
+
+    def is_cancelled(self, task_id):
+        return task_id in self._cancelled
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': len(self._running),
+                'queued': len(self._heap),
+            }
+
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._worker, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                (_, _, task_id, job), shifted = self._pop()
+                self._running.add(task_id)
+
+            progress_broker.publish_many([task_id] + shifted)
+            try:
+                job()
+            except Exception as e:
+                log(f'Neočekávaná chyba úlohy {task_id}: {e}')
+            finally:
+                with self._cond:
+                    self._running.discard(task_id)
+                    self._cancelled.discard(task_id)
+
+scheduler = DownloadScheduler(CONFIG['MAX_CONCURRENT_DOWNLOADS'])
+
+# ============================================================================
+# ODHAD PROPUSTNOSTI
+# ============================================================================
+
+class BandwidthEstimator:
+    """
+    Odhad propustnosti pro automatickou volbu počtu fragmentů.
+
+    Sleduje rychlost jednoho spojení (klouzavý průměr rychlosti úlohy
+    dělené počtem jejích fragmentů) a propustnost linky (CONFIG['LINK_BANDWIDTH'],
+    jinak nejvyšší pozorovaná souhrnná rychlost všech úloh, pomalu
+    zapomínaná). Počet fragmentů pak vychází tak, aby běžící stahování
+    linku právě vytížila - s rezervou 25 %, takže dokud linka není plná,
+    počet fragmentů postupně roste.
+    """
+
+    SMOOTHING = 0.3
+    PEAK_DECAY = 0.999
+    HEADROOM = 1.25
+
+    def __init__(self):
+        self._per_connection = None
+        self._peak = None
+        self._speeds = {}  # task_id -> aktuální rychlost B/s
+        self._lock = threading.Lock()
+
+    def report(self, task_id, speed, fragments):
+        if not speed:
+            return
+        with self._lock:
+            self._speeds[task_id] = speed
+            sample = speed / max(1, fragments)
+            if self._per_connection is None:
+                self._per_connection = sample
+            else:
+                self._per_connection += self.SMOOTHING * (sample - self._per_connection)
+            total = sum(self._speeds.values())
+            self._peak = max(total, (self._peak or 0) * self.PEAK_DECAY)
+
+    def finish(self, task_id):
+        with self._lock:
+            self._speeds.pop(task_id, None)
+
+    def current_speed(self):
+        with self._lock:
+            return sum(self._speeds.values())
+
+    def link_bandwidth(self):
+        link = CONFIG['LINK_BANDWIDTH'] or self._peak
+        if rate_limiter.rate:
+            # Víc, než dovolí globální limit, stejně neprojde
+            link = min(link or rate_limiter.rate, rate_limiter.rate)
+        return link
+
+    def suggest_fragments(self, running):
+        """Doporučený počet fragmentů pro novou úlohu při `running` běžících stahováních."""
+        link = self.link_bandwidth()
+        with self._lock:
+            per_connection = self._per_connection
+        if not link or not per_connection:
+            return CONFIG['FRAGMENTS_DEFAULT']
+        share = link * self.HEADROOM / max(1, running)
+        return max(1, min(CONFIG['FRAGMENTS_MAX'], math.ceil(share / per_connection)))
+
+    def stats(self):
+        return {
+            'link_bandwidth': self.link_bandwidth(),
+            'per_connection': self._per_connection,
+        }
+
+bandwidth = BandwidthEstimator()
+
+class TokenBucket:
+    """
+    Globální rozpočet přenosové rychlosti sdílený všemi stahováními.
+
+    Progress hooky yt-dlp běží ve vláknech, která stahují, takže když
+    consume() vlákno uspí, zpomalí tím právě jeho stahování. Spotřeba může
+    jít do dluhu - vlákno pak spí, dokud se dluh nesplatí, a celková
+    rychlost tak drží `rate` bez ohledu na počet úloh. `rate=None` = bez limitu.
+    """
+
+    def __init__(self, rate=None, burst_seconds=1.0):
+        self.burst_seconds = burst_seconds
+        self._rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._seen = {}  # task_id -> poslední hlášený počet bajtů
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._rate = rate
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+    def account(self, task_id, downloaded):
+        """
+        Započítá bajty stažené úlohou od minulého volání a případně počká.
+        Vrací počet nově započítaných bajtů.
+        """
+        with self._lock:
+            previous = self._seen.get(task_id, 0)
+            # Pokles = začala další stopa/soubor, počítat od nuly
+            delta = downloaded - previous if downloaded >= previous else downloaded
+            self._seen[task_id] = downloaded
+        if delta > 0:
+            self.consume(delta)
+        return delta
+
+    def consume(self, amount):
+        with self._lock:
+            rate = self._rate
+            if not rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(rate * self.burst_seconds, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(min(wait, 5.0))
+
+    def forget(self, task_id):
+        with self._lock:
+            self._seen.pop(task_id, None)
+
+rate_limiter = TokenBucket(CONFIG['RATE_LIMIT'])
+
+# ============================================================================
+# METRIKY
+# ============================================================================
+
+class Metrics:
+    """
+    Čítače a histogramy pro endpoint /metrics (textový formát Prometheus).
+
+    Bez závislosti na prometheus_client - hodnoty se drží ve slovnících
+    pod jedním zámkem. Stavové hodnoty (fronta, cache) se nedrží tady,
+    ale čtou se až při exportu z příslušných objektů.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+    def __init__(self):
+        self._help = {}
+        self._counters = {}    # (jméno, štítky) -> hodnota
+        self._histograms = {}  # (jméno, štítky) -> [počty v bucketech, součet, počet]
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(self.BUCKETS), 0.0, 0]
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def render(self, gauges=()):
+        """
+        Vrátí metriky jako text. `gauges` jsou trojice (jméno, štítky, hodnota)
+        spočítané v okamžiku exportu.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+
+        samples = {}
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append((name, labels, value))
+        for (name, labels), (buckets, total, count) in histograms.items():
+            rows = samples.setdefault(name, [])
+            for bound, n in zip(self.BUCKETS, buckets):
+                rows.append((name + '_bucket', labels + (('le', repr(float(bound))),), n))
+            rows.append((name + '_bucket', labels + (('le', '+Inf'),), count))
+            rows.append((name + '_sum', labels, total))
+            rows.append((name + '_count', labels, count))
+        for name, labels, value in gauges:
+            samples.setdefault(name, []).append((name, tuple(sorted(labels.items())), value))
+
+        lines = []
+        for name in sorted(samples):
+            if name in self._help:
+                kind, text = self._help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in samples[name]:
+                if labels:
+                    label_text = ','.join(f'{k}="{self._escape(v)}"' for k, v in labels)
+                    lines.append(f'{sample}{{{label_text}}} {value}')
+                else:
+                    lines.append(f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = Metrics()
+metrics.describe('yt_http_requests_total', 'counter', 'Počet HTTP požadavků podle endpointu a stavu')
+metrics.describe('yt_http_request_duration_seconds', 'histogram', 'Doba vyřízení HTTP požadavku')
+metrics.describe('yt_extraction_duration_seconds', 'histogram', 'Doba extrakce metadat yt-dlp')
+metrics.describe('yt_postprocess_duration_seconds', 'histogram', 'Doba ffmpeg post-processingu (slučování, konverze)')
+metrics.describe('yt_download_bytes_total', 'counter', 'Celkem stažené bajty')
+metrics.describe('yt_downloads_finished_total', 'counter', 'Dokončené úlohy podle výsledku')
+metrics.describe('yt_download_speed_bytes', 'gauge', 'Aktuální souhrnná rychlost stahování (B/s)')
+metrics.describe('yt_queue_depth', 'gauge', 'Počet úloh čekajících ve frontě')
+metrics.describe('yt_active_downloads', 'gauge', 'Počet právě běžících stahování')
+metrics.describe('yt_cache_hits_total', 'counter', 'Zásahy cache podle druhu cache')
+metrics.describe('yt_cache_misses_total', 'counter', 'Výpadky cache podle druhu cache')
+metrics.describe('yt_cache_hit_ratio', 'gauge', 'Podíl zásahů cache')
+
+# Segmenty cesty s ID úlohy se ve štítcích nahrazují zástupcem, aby
+# počet časových řad nerostl s počtem úloh
+METRIC_ROUTES = ('/api/progress/', '/api/file/', '/api/stream/', '/api/cancel/')
+KNOWN_PATHS = (
+    '/api/status', '/api/info', '/api/info/batch', '/api/events', '/api/playlist',
+    '/api/playlist/download', '/api/download', '/api/ratelimit', '/api/formats', '/api/stats',
+    '/metrics',
+)
+
+def metric_endpoint(path):
+    """Cesta požadavku -> štítek endpointu pro metriky."""
+    path = urlparse(path).path
+    if path in KNOWN_PATHS:
+        return path
+    for prefix in METRIC_ROUTES:
+        if path.startswith(prefix):
+            if prefix == '/api/progress/' and path.endswith('/stream'):
+                return '/api/progress/<id>/stream'
+            return prefix + '<id>'
+    return 'other'
+
+def collect_gauges():
+    """Stavové metriky čtené v okamžiku exportu."""
+    queue = scheduler.stats()
+    gauges = [
+        ('yt_queue_depth', {}, queue['queued']),
+        ('yt_active_downloads', {}, queue['running']),
+        ('yt_download_speed_bytes', {}, bandwidth.current_speed()),
+    ]
+    caches = [('info', info_cache.stats())]
+    if dedupe_cache:
+        caches.append(('files', dedupe_cache.stats()))
+    for cache_name, stats in caches:
+        total = stats['hits'] + stats['misses']
+        gauges += [
+            ('yt_cache_hits_total', {'cache': cache_name}, stats['hits']),
+            ('yt_cache_misses_total', {'cache': cache_name}, stats['misses']),
+            ('yt_cache_hit_ratio', {'cache': cache_name}, round(stats['hits'] / total, 3) if total else 0.0),
+        ]
+    return gauges
 
 # ============================================================================
 # POMOCNÉ FUNKCE
 # ============================================================================
 
+# Video ID: 11 znaků [0-9A-Za-z_-]. Jeden předkompilovaný výraz pro
+# holé ID, youtu.be/ID, youtube.com|m.|music.|youtube-nocookie.com
+# /watch?...v=ID, /shorts/ID, /embed/ID, /live/ID, /v/ID, /e/ID
+VIDEO_ID_RE = re.compile(
+    r'^(?:(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch/?\?(?:[^#]*?&)?v=|(?:shorts|embed|live|v|e)/)'
+    r'|youtu\.be/))?'
+    r'([0-9A-Za-z_-]{11})(?:$|[?&#/])'
+)
+
 def log(*args):
     if CONFIG['DEBUG']:
         print('[YT Server]', *args)
 
 def extract_video_id(url):
-    """Extrahuje video ID z YouTube URL."""
+    """Extrahuje video ID z YouTube URL (nebo holého ID), jinak vrátí None."""
     if not url:
         return None
+    match = VIDEO_ID_RE.match(url)
+    return match.group(1) if match else None
 
-    # Přímé video ID
-    if len(url) == 11 and url.isalnum():
-        return url
+def extract_playlist_url(url):
+    """
+    Převede URL playlistu nebo kanálu na kanonickou podobu pro yt-dlp.
+
+    Podporuje youtube.com/playlist?list=XXX, watch?v=...&list=XXX a kanály
+    (/@handle, /channel/ID, /c/NAME, /user/NAME). U kanálů bez záložky se
+    použije záložka /videos, aby flat extrakce vrátila přímo videa.
+    """
+    if not url:
+        return None
 
     try:
         parsed = urlparse(url)
+    except ValueError:
+        return None
+
+    if 'youtube.com' not in parsed.netloc:
+        return None
 
-        # youtube.com/watch?v=XXX
-        if 'youtube.com' in parsed.netloc:
-            qs = parse_qs(parsed.query)
-            if 'v' in qs:
-                return qs['v'][0]
-            # /shorts/XXX nebo /embed/XXX
-            path_parts = parsed.path.split('/')
-            for i, part in enumerate(path_parts):
-                if part in ['shorts', 'embed', 'v'] and i + 1 < len(path_parts):
-                    return path_parts[i + 1]
-
-        # youtu.be/XXX
-        if 'youtu.be' in parsed.netloc:
-            return parsed.path.strip('/')
+    list_id = parse_qs(parsed.query).get('list', [None])[0]
+    if list_id:
+        return f'https://www.youtube.com/playlist?list={list_id}'
 
-    except Exception as e:
-        log(f'Chyba při extrakci video ID: {e}')
+    parts = [p for p in parsed.path.split('/') if p]
+    if not parts:
+        return None
+    if parts[0].startswith('@'):
+        channel = parts[:1]
+        tabs = parts[1:]
+    elif parts[0] in ('channel', 'c', 'user') and len(parts) > 1:
+        channel = parts[:2]
+        tabs = parts[2:]
+    else:
+        return None
 
-    return None
+    tab = tabs[0] if tabs and tabs[0] in ('videos', 'shorts', 'streams') else 'videos'
+    return 'https://www.youtube.com/' + '/'.join(channel + [tab])
 
 def format_size(bytes_size):
     """Formátuje velikost souboru."""
@@ -100,6 +1255,119 @@ def format_size(bytes_size):
         bytes_size /= 1024
     return f'{bytes_size:.1f} TB'
 
+def parse_byte_range(header, size):
+    """
+    Zpracuje hlavičku Range ('bytes=START-END', 'bytes=START-', 'bytes=-N').
+    Vrací (start, end) včetně, nebo None pro nesplnitelný rozsah.
+    Z více rozsahů se použije jen první.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    first, _, last = spec.split(',')[0].strip().partition('-')
+    try:
+        if not first:
+            # Posledních N bajtů
+            suffix = int(last)
+            if suffix <= 0:
+                return None
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+def parse_fragments(value):
+    """Ověří počet fragmentů z požadavku: None, 'auto' nebo kladné číslo."""
+    if value in (None, '', 'auto'):
+        return value or None
+    fragments = int(value)
+    if fragments < 1:
+        raise ValueError('fragments')
+    return min(fragments, CONFIG['FRAGMENTS_MAX'])
+
+def parse_rate(value):
+    """Převede rychlost z požadavku (číslo v B/s nebo text '5M') na B/s; None/0 = bez limitu."""
+    if value in (None, '', 0, '0'):
+        return None
+    if isinstance(value, str) and not value.isdigit():
+        rate = yt_dlp.utils.parse_bytes(value) if YT_DLP_AVAILABLE else None
+        if not rate:
+            raise ValueError(value)
+        return rate
+    rate = int(value)
+    if rate < 0:
+        raise ValueError(value)
+    return rate or None
+
+def clone_file(src, dst):
+    """
+    Vytvoří `dst` se stejným obsahem jako `src` co nejlevněji: hardlink,
+    na Linuxu reflink (FICLONE - btrfs, XFS), jinak běžná kopie.
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+
+    if sys.platform.startswith('linux'):
+        import fcntl
+        FICLONE = 0x40049409
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(src, dst)
+
+def normalize_acodec(acodec):
+    """Kodek z metadat yt-dlp -> krátký název ('mp4a.40.2' -> 'aac')."""
+    if not acodec or acodec == 'none':
+        return None
+    codec = acodec.lower().split('.')[0]
+    return 'aac' if codec == 'mp4a' else codec
+
+def convert_audio(source, audio_format, source_codec=None):
+    """
+    Převede stažené audio na `audio_format` podle AUDIO_PRESETS.
+
+    Když zdrojový kodek cílovému odpovídá, soubor se jen přebalí
+    (-c:a copy), a pokud sedí i přípona, nechá se beze změny. Zdrojový
+    soubor se po úspěšné konverzi smaže. Vrací cestu k výslednému souboru.
+    """
+    preset = AUDIO_PRESETS[audio_format]
+    stem, ext = os.path.splitext(source)
+    copy_codec = normalize_acodec(source_codec) in preset['copy_codecs']
+    if copy_codec and ext[1:].lower() == preset['ext']:
+        return source
+
+    target = f'{stem}.{preset["ext"]}'
+    temp_path = f'{stem}.temp.{preset["ext"]}'
+    audio_args = ['-c:a', 'copy'] if copy_codec else ['-c:a', preset['codec'], *preset['args']]
+    cmd = [
+        CONFIG['FFMPEG_PATH'], '-y', '-nostdin', '-loglevel', 'error',
+        '-i', source, '-vn', '-threads', str(preset['threads']), *audio_args, temp_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        message = result.stderr.strip().splitlines()
+        raise RuntimeError(f'ffmpeg: {message[-1] if message else result.returncode}')
+
+    os.replace(temp_path, target)
+    if target != source:
+        os.remove(source)
+    return target
+
 def sanitize_filename(name):
     """Vyčistí název souboru."""
     invalid_chars = '<>:"/\\|?*'
@@ -111,8 +1379,15 @@ def sanitize_filename(name):
 # YT-DLP FUNKCE
 # ============================================================================
 
-def get_video_info(url):
-    """Získá informace o videu včetně všech formátů."""
+def get_video_info(url, refresh=False):
+    """
+    Získá informace o videu včetně všech formátů.
+
+    Výsledek se ukládá do info_cache; opakovaný dotaz na stejné video
+    se vrátí z cache bez nové extrakce. `refresh=True` cache obejde.
+    Spolu s odpovědí se ukládá i surový výsledek extrakce, který pak
+    použije download_video() místo druhé extrakce.
+    """
     if not YT_DLP_AVAILABLE:
         return {'error': 'yt-dlp není nainstalován'}
 
@@ -120,79 +1395,268 @@ def get_video_info(url):
     if not video_id:
         return {'error': 'Neplatná YouTube URL'}
 
+    if not refresh:
+        cached = info_cache.get(video_id)
+        if cached is not None:
+            return dict(cached['response'], cached=True)
+
     ydl_opts = {
         'quiet': True,
         'no_warnings': True,
         'extract_flat': False,
+        # Stejné formáty jako při stahování, aby šel výsledek z cache
+        # použít i pro paralelní stahování fragmentů
+        'extractor_args': FRAGMENTED_EXTRACTOR_ARGS,
     }
 
+    started = time.perf_counter()
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+    except Exception as e:
+        log(f'Chyba při získávání info: {e}')
+        return {'error': str(e)}
 
-            # Zpracovat formáty
-            formats_data = {
-                'video': [],      # Video + audio
-                'video_only': [], # Pouze video (adaptive)
-                'audio': [],      # Pouze audio
-            }
+    finally:
+        metrics.observe('yt_extraction_duration_seconds', time.perf_counter() - started, source='info')
+
+    result = store_extraction(video_id, info)
+    return dict(result, cached=False)
+
+def store_extraction(video_id, info):
+    """Uloží výsledek extrakce do info_cache a vrátí odpověď pro /api/info."""
+    result = build_info_response(video_id, info)
+    info_cache.set(video_id, {
+        'response': result,
+        # Bez privátních klíčů (requested_formats, _filename...) - dict lze
+        # znovu předat do process_ie_result() s jiným výběrem formátu
+        'info': yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True),
+    })
+    return result
+
+def get_cached_extraction(video_id):
+    """Vrátí kopii surového výsledku extrakce z cache, nebo None."""
+    # peek() - hits/misses počítají jen požadavky /api/info
+    cached = info_cache.peek(video_id)
+    if cached is None:
+        return None
+    # process_ie_result() dict modifikuje - cache musí zůstat nedotčená
+    return copy.deepcopy(cached['info'])
 
-            for f in info.get('formats', []):
-                format_info = {
-                    'format_id': f.get('format_id'),
-                    'ext': f.get('ext'),
-                    'quality': f.get('format_note') or f.get('quality'),
-                    'resolution': f.get('resolution'),
-                    'height': f.get('height'),
-                    'width': f.get('width'),
-                    'fps': f.get('fps'),
-                    'filesize': f.get('filesize') or f.get('filesize_approx'),
-                    'filesize_str': format_size(f.get('filesize') or f.get('filesize_approx')),
-                    'vcodec': f.get('vcodec'),
-                    'acodec': f.get('acodec'),
-                    'abr': f.get('abr'),
-                    'vbr': f.get('vbr'),
-                    'tbr': f.get('tbr'),
-                }
-
-                has_video = f.get('vcodec') and f.get('vcodec') != 'none'
-                has_audio = f.get('acodec') and f.get('acodec') != 'none'
-
-                if has_video and has_audio:
-                    formats_data['video'].append(format_info)
-                elif has_video:
-                    formats_data['video_only'].append(format_info)
-                elif has_audio:
-                    formats_data['audio'].append(format_info)
-
-            # Seřadit podle kvality
-            formats_data['video'].sort(key=lambda x: x.get('height') or 0, reverse=True)
-            formats_data['video_only'].sort(key=lambda x: x.get('height') or 0, reverse=True)
-            formats_data['audio'].sort(key=lambda x: x.get('abr') or 0, reverse=True)
+def iter_video_info_batch(urls, refresh=False):
+    """
+    Získá info pro více videí najednou.
 
-            return {
-                'success': True,
-                'video_id': video_id,
-                'title': info.get('title'),
-                'author': info.get('uploader'),
-                'duration': info.get('duration'),
-                'duration_str': f"{info.get('duration', 0) // 60}:{info.get('duration', 0) % 60:02d}",
-                'thumbnail': info.get('thumbnail'),
-                'view_count': info.get('view_count'),
-                'formats': formats_data,
-                'available_qualities': list(set(
-                    f.get('height') for f in formats_data['video'] + formats_data['video_only']
-                    if f.get('height')
-                )),
-            }
+    Duplicitní URL (stejné video ID) se zpracují jen jednou. Extrakce běží
+    souběžně ve sdíleném poolu (CONFIG['BATCH_WORKERS']) a výsledky se
+    vydávají postupně, jak které video doběhne - neplatné URL hned na začátku.
+    """
+    inputs_by_id = OrderedDict()
+    for url in urls:
+        video_id = extract_video_id(url) if isinstance(url, str) else None
+        if not video_id:
+            yield {'url': url, 'error': 'Neplatná YouTube URL'}
+            continue
+        inputs_by_id.setdefault(video_id, []).append(url)
+
+    futures = {
+        batch_executor.submit(get_video_info, f'https://www.youtube.com/watch?v={video_id}', refresh): video_id
+        for video_id in inputs_by_id
+    }
+    for future in as_completed(futures):
+        video_id = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'error': str(e)}
+        yield dict(result, video_id=video_id, urls=inputs_by_id[video_id])
+
+batch_executor = ThreadPoolExecutor(max_workers=CONFIG['BATCH_WORKERS'], thread_name_prefix='batch-info')
 
+# Každá konverze je samostatný proces ffmpeg; pool jen omezuje, kolik
+# jich běží současně. Stahování na konverzi nečeká - jeho slot ve frontě
+# se uvolní hned po stažení.
+audio_pool = ThreadPoolExecutor(max_workers=CONFIG['AUDIO_WORKERS'], thread_name_prefix='audio')
+
+def get_playlist_entries(url, refresh=False):
+    """
+    Vypíše videa playlistu nebo kanálu pomocí flat extrakce.
+
+    Flat extrakce načte jen seznam položek (ID, název, délka) bez
+    extrakce každého videa zvlášť. Výsledek se ukládá do info_cache
+    pod klíčem 'playlist:<url>'.
+    """
+    if not YT_DLP_AVAILABLE:
+        return {'error': 'yt-dlp není nainstalován'}
+
+    playlist_url = extract_playlist_url(url)
+    if not playlist_url:
+        return {'error': 'Neplatná URL playlistu nebo kanálu'}
+
+    cache_key = f'playlist:{playlist_url}'
+    if not refresh:
+        cached = info_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'playlistend': CONFIG['PLAYLIST_MAX_ENTRIES'],
+    }
+
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(playlist_url, download=False)
     except Exception as e:
-        log(f'Chyba při získávání info: {e}')
+        log(f'Chyba při načítání playlistu: {e}')
         return {'error': str(e)}
 
-def download_video(url, format_type='best', quality=None, audio_format=None, output_dir=None):
+    entries = []
+    for entry in info.get('entries') or []:
+        # Vnořené playlisty/záložky přeskočit - chceme jen videa
+        if not entry or entry.get('ie_key') not in (None, 'Youtube'):
+            continue
+        video_id = entry.get('id')
+        if not video_id:
+            continue
+        entries.append({
+            'video_id': video_id,
+            'title': entry.get('title'),
+            'duration': entry.get('duration'),
+            'url': f'https://www.youtube.com/watch?v={video_id}',
+        })
+
+    result = {
+        'success': True,
+        'playlist_id': info.get('id'),
+        'title': info.get('title'),
+        'author': info.get('uploader') or info.get('channel'),
+        'url': playlist_url,
+        'entries': entries,
+    }
+    info_cache.set(cache_key, result)
+    return dict(result, cached=False)
+
+def get_playlist_page(url, page=1, page_size=None, refresh=False):
+    """Vrátí jednu stránku položek playlistu (stránky číslované od 1)."""
+    result = get_playlist_entries(url, refresh)
+    if 'error' in result:
+        return result
+
+    page_size = page_size or CONFIG['PLAYLIST_PAGE_SIZE']
+    entries = result['entries']
+    start = (page - 1) * page_size
+    return dict(
+        result,
+        entries=entries[start:start + page_size],
+        page=page,
+        page_size=page_size,
+        total=len(entries),
+        pages=(len(entries) + page_size - 1) // page_size,
+    )
+
+def download_playlist(url, format_type='video', quality=None, audio_format=None,
+                      output_dir=None, priority=0, start=1, end=None):
+    """
+    Zařadí videa playlistu (položky start..end, od 1) do fronty stahování.
+
+    Žurnál se zapíše jednou transakcí a fronta se naplní jedním
+    submit_many() - i kanál s tisíci videi se zařadí hned.
     """
-    Stáhne video/audio z YouTube.
+    result = get_playlist_entries(url)
+    if 'error' in result:
+        return result
+
+    tasks = []
+    prepared = []
+    for entry in result['entries'][start - 1:end]:
+        item = prepare_download(entry['url'], format_type, quality, audio_format, output_dir, priority)
+        tasks.append({'video_id': entry['video_id'], 'task_id': item.get('task_id'),
+                      'error': item.get('error')})
+        if item.get('job'):
+            prepared.append(item)
+
+    download_tasks.journal_many([(item['task_id'], item['journal']) for item in prepared])
+    scheduler.submit_many([(item['task_id'], item['job'], item['priority']) for item in prepared])
+
+    return {
+        'success': True,
+        'playlist_id': result['playlist_id'],
+        'title': result['title'],
+        'queued': sum(1 for t in tasks if t['task_id']),
+        'tasks': tasks,
+    }
+
+def build_info_response(video_id, info):
+    """Sestaví odpověď /api/info z výsledku extrakce yt-dlp."""
+    # Zpracovat formáty
+    formats_data = {
+        'video': [],      # Video + audio
+        'video_only': [], # Pouze video (adaptive)
+        'audio': [],      # Pouze audio
+    }
+
+    for f in info.get('formats', []):
+        format_info = {
+            'format_id': f.get('format_id'),
+            'ext': f.get('ext'),
+            'quality': f.get('format_note') or f.get('quality'),
+            'resolution': f.get('resolution'),
+            'height': f.get('height'),
+            'width': f.get('width'),
+            'fps': f.get('fps'),
+            'filesize': f.get('filesize') or f.get('filesize_approx'),
+            'filesize_str': format_size(f.get('filesize') or f.get('filesize_approx')),
+            'vcodec': f.get('vcodec'),
+            'acodec': f.get('acodec'),
+            'abr': f.get('abr'),
+            'vbr': f.get('vbr'),
+            'tbr': f.get('tbr'),
+        }
+
+        has_video = f.get('vcodec') and f.get('vcodec') != 'none'
+        has_audio = f.get('acodec') and f.get('acodec') != 'none'
+
+        if has_video and has_audio:
+            formats_data['video'].append(format_info)
+        elif has_video:
+            formats_data['video_only'].append(format_info)
+        elif has_audio:
+            formats_data['audio'].append(format_info)
+
+    # Seřadit podle kvality
+    formats_data['video'].sort(key=lambda x: x.get('height') or 0, reverse=True)
+    formats_data['video_only'].sort(key=lambda x: x.get('height') or 0, reverse=True)
+    formats_data['audio'].sort(key=lambda x: x.get('abr') or 0, reverse=True)
+
+    return {
+        'success': True,
+        'video_id': video_id,
+        'title': info.get('title'),
+        'author': info.get('uploader'),
+        'duration': info.get('duration'),
+        'duration_str': f"{info.get('duration', 0) // 60}:{info.get('duration', 0) % 60:02d}",
+        'thumbnail': info.get('thumbnail'),
+        'view_count': info.get('view_count'),
+        'formats': formats_data,
+        'available_qualities': list(set(
+            f.get('height') for f in formats_data['video'] + formats_data['video_only']
+            if f.get('height')
+        )),
+    }
+
+def prepare_download(url, format_type='best', quality=None, audio_format=None, output_dir=None, priority=0,
+                     live=False, fragments=None, chunk_size=None, rate_limit=None, task_id=None):
+    """
+    Připraví stažení videa/audia z YouTube: založí úlohu a sestaví job
+    pro frontu. Do žurnálu a fronty ji zapíše až volající
+    (download_video(), download_playlist() - ten po dávkách).
+
+    Vrací {'task_id', 'priority', 'journal', 'job'}, nebo {'error'}.
+    Vydá-li se soubor z cache stažených souborů, je 'job' None a úloha
+    se do fronty nezařazuje.
 
     Args:
         url: YouTube URL
@@ -200,6 +1664,15 @@ def download_video(url, format_type='best', quality=None, audio_format=None, out
         quality: Kvalita videa (např. 1080, 720)
         audio_format: Pro audio - 'mp3', 'wav', 'm4a', 'flac', 'ogg'
         output_dir: Složka pro uložení
+        priority: Priorita ve frontě (vyšší = dříve)
+        live: Vybrat jednosouborový formát bez slučování a konverze, aby šlo
+              soubor přeposílat klientovi už během stahování (/api/stream)
+        fragments: Počet paralelně stahovaných fragmentů (None = CONFIG['FRAGMENTS'])
+        chunk_size: Velikost HTTP bloku v bajtech (None = CONFIG['HTTP_CHUNK_SIZE']).
+                    Uplatní se jen u nefragmentovaných formátů (live režim,
+                    progresivní formáty) - DASH fragmenty se stahují celé
+        rate_limit: Limit rychlosti úlohy v B/s (None = CONFIG['TASK_RATE_LIMIT'])
+        task_id: ID úlohy obnovované ze žurnálu (None = nová úloha)
     """
     if not YT_DLP_AVAILABLE:
         return {'error': 'yt-dlp není nainstalován'}
@@ -208,29 +1681,53 @@ def download_video(url, format_type='best', quality=None, audio_format=None, out
     if not video_id:
         return {'error': 'Neplatná YouTube URL'}
 
-    task_id = str(uuid.uuid4())[:8]
-    download_tasks[task_id] = {
-        'status': 'starting',
-        'progress': 0,
-        'filename': None,
-        'error': None,
+    resumed = task_id is not None
+    task_id = task_id or str(uuid.uuid4())[:8]
+    fragments = fragments or CONFIG['FRAGMENTS']
+    chunk_size = chunk_size or CONFIG['HTTP_CHUNK_SIZE']
+    rate_limit = rate_limit or CONFIG['TASK_RATE_LIMIT']
+    download_tasks.create(task_id, priority=priority, live=live, chunk_size=chunk_size,
+                          rate_limit=rate_limit, resumed=resumed)
+    # Původní parametry (ne odvozené výchozí), aby se po restartu použila aktuální konfigurace
+    journal = {
+        'url': url,
+        'format_type': format_type,
+        'quality': quality,
+        'audio_format': audio_format,
+        'output_dir': output_dir,
+        'priority': priority,
+        'live': live,
+        'fragments': None if fragments == CONFIG['FRAGMENTS'] else fragments,
+        'chunk_size': None if chunk_size == CONFIG['HTTP_CHUNK_SIZE'] else chunk_size,
+        'rate_limit': None if rate_limit == CONFIG['TASK_RATE_LIMIT'] else rate_limit,
     }
 
     output_dir = output_dir or CONFIG['DOWNLOAD_DIR']
     os.makedirs(output_dir, exist_ok=True)
 
     def progress_hook(d):
+        if scheduler.is_cancelled(task_id):
+            raise yt_dlp.utils.DownloadCancelled('Stahování zrušeno')
         if d['status'] == 'downloading':
             total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-            downloaded = d.get('downloaded_bytes', 0)
-            if total > 0:
-                download_tasks[task_id]['progress'] = int((downloaded / total) * 100)
-            download_tasks[task_id]['status'] = 'downloading'
-            download_tasks[task_id]['speed'] = d.get('speed')
-            download_tasks[task_id]['eta'] = d.get('eta')
+            fields = {}
+            if d.get('tmpfilename') and download_tasks.get(task_id).partial_path != d['tmpfilename']:
+                fields['partial_path'] = d['tmpfilename']
+                fields['filepath'] = d.get('filename')
+            report_progress(task_id, d.get('downloaded_bytes', 0), total, d.get('speed'), d.get('eta'), **fields)
         elif d['status'] == 'finished':
-            download_tasks[task_id]['status'] = 'processing'
-            download_tasks[task_id]['progress'] = 100
+            update_task(task_id, status='processing', progress=100, filepath=d.get('filename'),
+                        download_finished_at=time.time())
+
+    pp_started = {}
+
+    def postprocessor_hook(d):
+        name = d.get('postprocessor')
+        if d['status'] == 'started':
+            pp_started[name] = time.perf_counter()
+        elif d['status'] == 'finished' and name in pp_started:
+            metrics.observe('yt_postprocess_duration_seconds', time.perf_counter() - pp_started.pop(name),
+                            postprocessor=name)
 
     # Nastavení yt-dlp
     ydl_opts = {
@@ -238,36 +1735,34 @@ def download_video(url, format_type='best', quality=None, audio_format=None, out
         'quiet': False,
         'no_warnings': False,
         'progress_hooks': [progress_hook],
+        'postprocessor_hooks': [postprocessor_hook],
+        'http_chunk_size': chunk_size,
     }
+    if rate_limit:
+        ydl_opts['ratelimit'] = rate_limit
+    if not live:
+        # Live režim potřebuje jeden sekvenčně rostoucí soubor - bez fragmentů
+        ydl_opts['extractor_args'] = FRAGMENTED_EXTRACTOR_ARGS
 
     # Nastavení formátu
-    if format_type == 'audio' or audio_format:
-        ydl_opts['format'] = 'bestaudio/best'
-
-        if audio_format == 'mp3':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '320',
-            }]
-        elif audio_format == 'wav':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-            }]
-        elif audio_format == 'm4a':
-            ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
-        elif audio_format == 'flac':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'flac',
-            }]
-        elif audio_format == 'ogg':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'vorbis',
-                'preferredquality': '320',
-            }]
+    if live:
+        # Jediný soubor stahovaný přes HTTP - .part roste sekvenčně a nic
+        # se potom neslučuje ani nekonvertuje
+        if format_type == 'audio' or audio_format:
+            ydl_opts['format'] = 'bestaudio[protocol^=http]/best[protocol^=http]'
+        elif quality:
+            ydl_opts['format'] = (
+                f'best[height<={quality}][vcodec!=none][acodec!=none][protocol^=http]/'
+                f'best[vcodec!=none][acodec!=none][protocol^=http]'
+            )
+        else:
+            ydl_opts['format'] = 'best[vcodec!=none][acodec!=none][protocol^=http]'
+    elif format_type == 'audio' or audio_format:
+        # Konverze na audio_format proběhne po stažení v audio_pool
+        if audio_format in AUDIO_PRESETS:
+            ydl_opts['format'] = AUDIO_PRESETS[audio_format]['format']
+        else:
+            ydl_opts['format'] = 'bestaudio/best'
     else:
         # Video formát
         if quality:
@@ -276,52 +1771,422 @@ def download_video(url, format_type='best', quality=None, audio_format=None, out
             ydl_opts['format'] = 'bestvideo+bestaudio/best'
         ydl_opts['merge_output_format'] = 'mp4'
 
+    convert_to = audio_format if audio_format in AUDIO_PRESETS and not live else None
+    dedupe_key = DedupeCache.make_key(video_id, ydl_opts, convert_to) if dedupe_cache and not live else None
+
+    def complete_from_cache(cached_path):
+        log(f'Úloha {task_id}: soubor z cache - {cached_path}')
+        update_task(
+            task_id,
+            status='completed',
+            progress=100,
+            filename=os.path.basename(cached_path),
+            filepath=cached_path,
+            dedupe_hit=True,
+        )
+
+    def copy_from_cache(entry):
+        try:
+            cached_path = dedupe_cache.copy(entry, output_dir)
+        except OSError as e:
+            log(f'Soubor z cache nelze zkopírovat, stahuji: {e}')
+            download_tasks.journal(task_id, journal)
+            scheduler.submit(task_id, do_download, priority)
+            return
+        complete_from_cache(cached_path)
+
+    def complete(filepath):
+        finished = time.time()
+        update_task(
+            task_id,
+            status='completed',
+            progress=100,
+            filename=os.path.basename(filepath) if filepath else None,
+            filepath=filepath,
+            finished_at=finished,
+            # Post-processing (merge, konverze) skončil až teď
+            postprocess_finished_at=finished,
+        )
+        if dedupe_key and filepath and os.path.isfile(filepath):
+            try:
+                dedupe_cache.store(dedupe_key, filepath)
+            except (OSError, sqlite3.Error) as e:
+                log(f'Soubor nelze uložit do cache: {e}')
+
+    def convert_and_complete(source, source_codec):
+        started = time.perf_counter()
+        try:
+            filepath = convert_audio(source, convert_to, source_codec)
+        except Exception as e:
+            log(f'Chyba při konverzi audia: {e}')
+            update_task(task_id, status='error', error=str(e))
+            return
+        finally:
+            metrics.observe('yt_postprocess_duration_seconds', time.perf_counter() - started,
+                            postprocessor='ConvertAudio')
+        complete(filepath)
+
     def do_download():
+        n_fragments = 1 if live else fragments
+        if n_fragments == 'auto':
+            n_fragments = bandwidth.suggest_fragments(scheduler.stats()['running'])
+        ydl_opts['concurrent_fragment_downloads'] = n_fragments
+        update_task(task_id, status='starting', started_at=time.time(), fragments=n_fragments)
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=True)
+                filepath = None
+                if live:
+                    # Live režim stahuje jiné (nefragmentované) formáty než cache.
+                    # Extrakce a stažení zvlášť, aby šlo změřit fázi extrakce.
+                    update_task(task_id, info_source='extract', extract_started_at=time.time())
+                    started = time.perf_counter()
+                    extracted = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+                    metrics.observe('yt_extraction_duration_seconds', time.perf_counter() - started,
+                                    source='download')
+                    update_task(task_id, extract_finished_at=time.time())
+                    info = ydl.process_ie_result(extracted, download=True)
+                else:
+                    cached_info = get_cached_extraction(video_id)
+                    if cached_info is not None:
+                        # Metadata už máme z /api/info - rovnou stahovat
+                        update_task(task_id, info_source='cache')
+                    else:
+                        update_task(task_id, info_source='extract', extract_started_at=time.time())
+                        started = time.perf_counter()
+                        extracted = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+                        metrics.observe('yt_extraction_duration_seconds', time.perf_counter() - started,
+                                        source='download')
+                        update_task(task_id, extract_finished_at=time.time())
+                        store_extraction(video_id, extracted)
+                        cached_info = yt_dlp.YoutubeDL.sanitize_info(extracted, remove_private_keys=True)
+
+                    # Výběr formátů bez stahování - zjistí, zda se bude slučovat
+                    selected = ydl.process_ie_result(copy.deepcopy(cached_info), download=False)
+                    requested = selected.get('requested_formats') or []
+                    if CONFIG['PARALLEL_STREAMS'] and len(requested) > 1:
+                        info = selected
+                        filepath = download_streams_parallel(
+                            task_id, ydl, ydl_opts, cached_info, requested, ydl.prepare_filename(selected))
+                    else:
+                        info = ydl.process_ie_result(cached_info, download=True)
 
                 # Zjistit název staženého souboru
-                if 'requested_downloads' in info and info['requested_downloads']:
+                if filepath:
+                    # Sloučeno v download_streams_parallel()
+                    pass
+                elif 'requested_downloads' in info and info['requested_downloads']:
                     filepath = info['requested_downloads'][0].get('filepath')
                 else:
                     title = sanitize_filename(info.get('title', 'video'))
                     ext = audio_format or 'mp4'
                     filepath = os.path.join(output_dir, f'{title}.{ext}')
 
-                download_tasks[task_id]['status'] = 'completed'
-                download_tasks[task_id]['progress'] = 100
-                download_tasks[task_id]['filename'] = os.path.basename(filepath) if filepath else None
-                download_tasks[task_id]['filepath'] = filepath
+            if convert_to:
+                # Konverze poběží v audio_pool, slot fronty se uvolní pro další stahování
+                update_task(task_id, status='processing', progress=100)
+                audio_pool.submit(convert_and_complete, filepath, info.get('acodec'))
+            else:
+                complete(filepath)
 
+        except yt_dlp.utils.DownloadCancelled:
+            log(f'Stahování {task_id} zrušeno')
+            update_task(task_id, status='cancelled')
         except Exception as e:
             log(f'Chyba při stahování: {e}')
-            download_tasks[task_id]['status'] = 'error'
-            download_tasks[task_id]['error'] = str(e)
+            update_task(task_id, status='error', error=str(e))
+        finally:
+            bandwidth.finish(task_id)
+            rate_limiter.forget(task_id)
 
-    # Spustit stahování v novém vlákně
-    thread = threading.Thread(target=do_download)
-    thread.start()
+    prepared = {'task_id': task_id, 'priority': priority, 'journal': journal, 'job': do_download}
+    if dedupe_key:
+        try:
+            entry = dedupe_cache.lookup(dedupe_key)
+            cached_path = dedupe_cache.link(entry, output_dir) if entry else None
+        except (OSError, sqlite3.Error) as e:
+            log(f'Chyba cache stažených souborů: {e}')
+            entry = cached_path = None
+        if cached_path:
+            # Hardlink nebo tentýž soubor v cíli - hotovo hned, bez fronty
+            complete_from_cache(cached_path)
+            prepared['job'] = None
+        elif entry:
+            # Hash/kopie může trvat - mimo HTTP vlákno i sloty fronty
+            update_task(task_id, status='processing', progress=100)
+            dedupe_pool.submit(copy_from_cache, entry)
+            prepared['job'] = None
+    return prepared
+
+def download_video(url, format_type='best', quality=None, audio_format=None, output_dir=None, priority=0,
+                   live=False, fragments=None, chunk_size=None, rate_limit=None, task_id=None):
+    """Zařadí stažení videa/audia z YouTube do fronty (parametry viz prepare_download())."""
+    prepared = prepare_download(url, format_type, quality, audio_format, output_dir, priority,
+                                live, fragments, chunk_size, rate_limit, task_id)
+    if 'error' in prepared:
+        return prepared
+    task_id = prepared['task_id']
+    if prepared['job'] is None:
+        return {
+            'success': True,
+            'task_id': task_id,
+            'queue_position': None,
+            'message': 'Soubor již stažen'
+        }
+    download_tasks.journal(task_id, prepared['journal'])
+    scheduler.submit(task_id, prepared['job'], priority)
 
     return {
         'success': True,
         'task_id': task_id,
-        'message': 'Stahování zahájeno'
+        'queue_position': scheduler.position(task_id),
+        'message': 'Stahování zařazeno do fronty'
     }
 
+def report_progress(task_id, downloaded, total, speed, eta, **fields):
+    """Zapíše průběh stahování úlohy (procenta, rychlost, čas do prvního bajtu)."""
+    delta = rate_limiter.account(task_id, downloaded)
+    if delta > 0:
+        metrics.inc('yt_download_bytes_total', delta)
+    task = download_tasks.get(task_id).snapshot()
+    bandwidth.report(task_id, speed, task.fragments)
+    fields.update(status='downloading', speed=speed, eta=eta)
+    if downloaded and task.time_to_first_byte is None:
+        fields['first_byte_at'] = time.time()
+        fields['time_to_first_byte'] = round(fields['first_byte_at'] - task.started_at, 3)
+    if total > 0:
+        fields['progress'] = int((downloaded / total) * 100)
+    update_task(task_id, **fields)
+
+class StreamAborted(Exception):
+    """Stopa přerušena, protože selhala jiná stopa téhož stahování."""
+
+def download_streams_parallel(task_id, ydl, ydl_opts, info, requested_formats, filepath):
+    """
+    Stáhne stopy formátu 'video+audio' současně a pak je sloučí ffmpeg.
+
+    Každá stopa se stahuje vlastní instancí YoutubeDL ve vlastním vlákně
+    do souboru '<název>.f<format_id>.<ext>'. Průběh úlohy je součtem
+    stažených bajtů obou stop. Když jedna stopa selže, druhá se přeruší
+    (StreamAborted) a vyvolá se původní chyba, ne přerušení.
+    Vrací cestu ke sloučenému souboru.
+    """
+    state = {}  # format_id -> (staženo, celkem, rychlost, eta)
+    lock = threading.Lock()
+    abort = threading.Event()
+    stem, _ = os.path.splitext(filepath)
+
+    def make_hook(format_id):
+        def hook(d):
+            if scheduler.is_cancelled(task_id):
+                raise yt_dlp.utils.DownloadCancelled('Stahování zrušeno')
+            if abort.is_set():
+                raise StreamAborted()
+            if d['status'] != 'downloading':
+                return
+            with lock:
+                state[format_id] = (
+                    d.get('downloaded_bytes') or 0,
+                    d.get('total_bytes') or d.get('total_bytes_estimate') or 0,
+                    d.get('speed') or 0,
+                    d.get('eta') or 0,
+                )
+                downloaded = sum(v[0] for v in state.values())
+                total = sum(v[1] for v in state.values())
+                speed = sum(v[2] for v in state.values())
+                eta = max(v[3] for v in state.values())
+            report_progress(task_id, downloaded, total, speed or None, eta or None)
+        return hook
+
+    def fetch(fmt):
+        opts = dict(
+            ydl_opts,
+            format=fmt['format_id'],
+            outtmpl=f'{stem}.f{fmt["format_id"]}.%(ext)s',
+            progress_hooks=[make_hook(fmt['format_id'])],
+            postprocessors=[],
+        )
+        opts.pop('merge_output_format', None)
+        try:
+            with yt_dlp.YoutubeDL(opts) as stream_ydl:
+                result = stream_ydl.process_ie_result(copy.deepcopy(info), download=True)
+            return result['requested_downloads'][0]['filepath']
+        except BaseException:
+            abort.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=len(requested_formats), thread_name_prefix=f'stream-{task_id}') as pool:
+        futures = [pool.submit(fetch, fmt) for fmt in requested_formats]
+        wait(futures)
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        # Skutečná příčina, ne přerušení ostatních stop, které vyvolala
+        raise next((e for e in errors if not isinstance(e, StreamAborted)), errors[0])
+    parts = [f.result() for f in futures]
+
+    update_task(task_id, status='processing', progress=100, download_finished_at=time.time())
+    merger = yt_dlp.postprocessor.FFmpegMergerPP(ydl)
+    temp_path = f'{stem}.temp{os.path.splitext(filepath)[1]}'
+    args = ['-c', 'copy']
+    for i, fmt in enumerate(requested_formats):
+        stream = 'v' if fmt.get('vcodec') not in (None, 'none') else 'a'
+        args += ['-map', f'{i}:{stream}:0']
+    started = time.perf_counter()
+    merger.run_ffmpeg_multiple_files(parts, temp_path, args)
+    metrics.observe('yt_postprocess_duration_seconds', time.perf_counter() - started, postprocessor='Merger')
+    os.replace(temp_path, filepath)
+    for part in parts:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+    return filepath
+
+def resume_unfinished_downloads():
+    """
+    Znovu zařadí úlohy, které při minulém běhu serveru nedoběhly.
+
+    Úloha si ponechá původní task_id. Výstupní šablona je deterministická,
+    takže yt-dlp najde existující .part soubory (i .ytdl stav fragmentů)
+    a pokračuje od místa přerušení (continuedl je výchozí).
+    """
+    resumed = 0
+    for task_id, options in download_tasks.journaled():
+        if task_id in download_tasks and download_tasks.get(task_id).status not in TERMINAL_STATES:
+            continue
+        result = download_video(task_id=task_id, **options)
+        if result.get('success'):
+            resumed += 1
+        else:
+            log(f'Úlohu {task_id} nelze obnovit: {result.get("error")}')
+    return resumed
+
+def cancel_download(task_id):
+    """Zruší čekající nebo běžící stahování."""
+    task = download_tasks.get(task_id)
+    if task is None:
+        return {'error': 'Úloha nenalezena'}, 404
+
+    state = scheduler.cancel(task_id)
+    if state is None:
+        return {'error': f'Úlohu ve stavu {task.status} nelze zrušit'}, 409
+
+    if state == 'queued':
+        update_task(task_id, status='cancelled', queue_position=None)
+    return {'success': True, 'task_id': task_id, 'was': state}, 200
+
 # ============================================================================
 # HTTP SERVER
 # ============================================================================
 
+class BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    """
+    HTTP server obsluhující každý požadavek ve vlastním vlákně.
+
+    Počet současně běžících vláken je omezen semaforem (CONFIG['MAX_CONNECTIONS']).
+    Při vyčerpání limitu dostane další spojení hned odpověď 503 - smyčka
+    accept() nikdy nečeká, takže pomalá extrakce neblokuje rychlé
+    požadavky (/api/progress, /api/status), ale server ani nezahltí vlákny.
+
+    Dlouho otevřená spojení (SSE, /api/stream, přenos souboru) si přes
+    acquire_stream_slot() přesunou slot do vlastního limitu
+    CONFIG['MAX_STREAMS'], aby nevyčerpala sloty běžných požadavků.
+    """
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    BUSY_BODY = json.dumps({'error': 'Server je přetížen, zkuste to znovu'}).encode()
+
+    def __init__(self, server_address, handler_class, max_connections, max_streams):
+        super().__init__(server_address, handler_class)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._stream_slots = threading.BoundedSemaphore(max_streams)
+        self._streams = set()  # spojení, která drží slot streamu místo běžného
+        self._streams_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self.reject_busy(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._streams_lock:
+                streaming = request in self._streams
+                self._streams.discard(request)
+            if streaming:
+                self._stream_slots.release()
+            else:
+                self._slots.release()
+
+    def acquire_stream_slot(self, request):
+        """
+        Vymění běžný slot spojení za slot streamu.
+        Vrací False, pokud je limit streamů vyčerpán (běžný slot zůstává).
+        """
+        if not self._stream_slots.acquire(blocking=False):
+            return False
+        with self._streams_lock:
+            self._streams.add(request)
+        self._slots.release()
+        return True
+
+    def reject_busy(self, request):
+        """Odpoví 503 bez vlákna handleru a spojení zavře."""
+        try:
+            # Krátce načíst požadavek, aby close() neposlalo RST místo odpovědi
+            request.settimeout(0.05)
+            request.recv(65536)
+        except OSError:
+            pass
+        try:
+            request.sendall(
+                b'HTTP/1.0 503 Service Unavailable\r\n'
+                b'Content-Type: application/json\r\n'
+                b'Access-Control-Allow-Origin: *\r\n'
+                b'Retry-After: 1\r\n'
+                b'Content-Length: %d\r\n\r\n%s' % (len(self.BUSY_BODY), self.BUSY_BODY)
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
 class RequestHandler(BaseHTTPRequestHandler):
     def log_message(self, format, *args):
         if CONFIG['DEBUG']:
             print(f'[HTTP] {args[0]}')
 
+    def handle_one_request(self):
+        # Počet a doba vyřízení požadavků pro /metrics
+        self._response_status = None
+        started = time.perf_counter()
+        super().handle_one_request()
+        # Při chybě parsování (414, 400) nemusí být path/command nastavené
+        path = getattr(self, 'path', None)
+        command = getattr(self, 'command', None)
+        if self._response_status is not None:
+            endpoint = metric_endpoint(path) if path else 'other'
+            metrics.inc('yt_http_requests_total', method=command or 'invalid', endpoint=endpoint,
+                        status=self._response_status)
+            metrics.observe('yt_http_request_duration_seconds', time.perf_counter() - started,
+                            method=command or 'invalid', endpoint=endpoint)
+
+    def send_response(self, code, message=None):
+        self._response_status = code
+        super().send_response(code, message)
+
     def send_cors_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Range, If-None-Match, If-Range')
+        self.send_header('Access-Control-Expose-Headers', 'Content-Length, Content-Range, Accept-Ranges, ETag')
 
     def send_json_response(self, data, status=200):
         self.send_response(status)
@@ -330,6 +2195,230 @@ class RequestHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(json.dumps(data).encode())
 
+    def enter_stream_mode(self):
+        """
+        Přesune spojení pod limit streamů (CONFIG['MAX_STREAMS']).
+        Při vyčerpání limitu odpoví 503 a vrátí False.
+        """
+        if self.server.acquire_stream_slot(self.request):
+            return True
+        self.send_response(503)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Retry-After', '1')
+        self.send_cors_headers()
+        self.end_headers()
+        self.wfile.write(json.dumps({'error': 'Příliš mnoho otevřených streamů'}).encode())
+        return False
+
+    def send_sse_headers(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_cors_headers()
+        self.end_headers()
+
+    def stream_progress(self, task_id=None):
+        """
+        Streamuje průběh úloh jako Server-Sent Events.
+
+        S `task_id` posílá jen danou úlohu a po jejím dokončení stream
+        ukončí; bez něj posílá změny všech úloh. Události se posílají
+        nejvýše jednou za CONFIG['SSE_MIN_INTERVAL'] - změny mezi tím se
+        slijí do jedné zprávy s aktuálním stavem.
+        """
+        if not self.enter_stream_mode():
+            return
+        self.send_sse_headers()
+        # Úvodní snapshot, pak jen změny
+        version = progress_broker.version
+        pending = [task_id] if task_id else list(download_tasks)
+
+        try:
+            while True:
+                for tid in pending:
+                    task = download_tasks.get(tid)
+                    if task is None:
+                        continue
+                    task = task.snapshot()
+                    payload = json.dumps(dict(task._asdict(), queue_position=scheduler.position(tid)))
+                    self.wfile.write(f'id: {version}\nevent: progress\ndata: {payload}\n\n'.encode())
+                    if task_id and task.status in TERMINAL_STATES:
+                        self.wfile.flush()
+                        return
+                if not pending:
+                    self.wfile.write(b': keepalive\n\n')
+                self.wfile.flush()
+
+                time.sleep(CONFIG['SSE_MIN_INTERVAL'])
+                version, pending = progress_broker.wait(version, CONFIG['SSE_KEEPALIVE'], task_id)
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient stream zavřel
+            pass
+
+    def send_task_file(self, task_id, head_only=False):
+        """
+        Pošle hotový soubor úlohy s podporou HTTP Range (206) a ETag (304).
+
+        Tělo se posílá přes socket.sendfile() - na Linuxu/macOS zero-copy
+        os.sendfile(), takže se soubor nenačítá do paměti Pythonu.
+        """
+        task = download_tasks.get(task_id)
+        if task is None:
+            self.send_json_response({'error': 'Úloha nenalezena'}, 404)
+            return
+        state = task.snapshot()
+        if state.status != 'completed' or not state.filepath or not os.path.isfile(state.filepath):
+            self.send_json_response({'error': 'Soubor není k dispozici'}, 404)
+            return
+
+        try:
+            f = open(state.filepath, 'rb')
+        except OSError as e:
+            self.send_json_response({'error': str(e)}, 500)
+            return
+
+        with f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            etag = f'"{st.st_ino:x}-{size:x}-{st.st_mtime_ns:x}"'
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_cors_headers()
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            status = 200
+            range_header = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if range_header and size and (not if_range or if_range == etag):
+                byte_range = parse_byte_range(range_header, size)
+                if byte_range is None:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_cors_headers()
+                    self.end_headers()
+                    return
+                start, end = byte_range
+                status = 206
+
+            length = end - start + 1 if size else 0
+            if not head_only and length and not self.enter_stream_mode():
+                return
+            content_type = mimetypes.guess_type(state.filepath)[0] or 'application/octet-stream'
+            filename = os.path.basename(state.filepath)
+
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(st.st_mtime, usegmt=True))
+            self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}")
+            if status == 206:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.send_cors_headers()
+            self.end_headers()
+
+            if head_only or not length:
+                return
+            try:
+                self.connection.sendfile(f, start, length)
+            except (BrokenPipeError, ConnectionResetError):
+                # Klient přenos přerušil (např. přeskočení ve videu)
+                pass
+
+    def stream_live_file(self, task_id):
+        """
+        Přeposílá soubor úlohy klientovi už během stahování.
+
+        Čte rozpracovaný .part soubor (po přejmenování hotový soubor) od
+        aktuálního offsetu a nové bajty posílá hned, jak je yt-dlp zapíše.
+        Na další data čeká přes progress_broker. Soubor se otevírá pro
+        každé čtení znovu, aby na Windows nebránil přejmenování .part.
+        """
+        task = download_tasks.get(task_id)
+        if task is None:
+            self.send_json_response({'error': 'Úloha nenalezena'}, 404)
+            return
+        if not task.live:
+            self.send_json_response({'error': 'Úloha nebyla spuštěna v režimu live'}, 409)
+            return
+
+        # Počkat, až yt-dlp začne zapisovat
+        version = 0
+        deadline = time.monotonic() + CONFIG['LIVE_STREAM_WAIT']
+        state = task.snapshot()
+        while not (state.partial_path or state.status in TERMINAL_STATES):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.send_json_response({'error': 'Stahování nezačalo včas'}, 504)
+                return
+            version, _ = progress_broker.wait(version, remaining, task_id)
+            state = task.snapshot()
+
+        if state.status in ('error', 'cancelled') or not (state.partial_path or state.filepath):
+            self.send_json_response({'error': state.error or 'Stahování selhalo'}, 410)
+            return
+
+        if not self.enter_stream_mode():
+            return
+
+        chunked = self.request_version == 'HTTP/1.1'
+        if chunked:
+            self.protocol_version = 'HTTP/1.1'
+        self.close_connection = True
+
+        self.send_response(200)
+        self.send_header('Content-Type', mimetypes.guess_type(state.filepath or '')[0] or 'application/octet-stream')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.send_cors_headers()
+        self.end_headers()
+
+        offset = 0
+        try:
+            while True:
+                state = task.snapshot()
+                data = b''
+                for path in (state.partial_path, state.filepath):
+                    if path and os.path.isfile(path):
+                        with open(path, 'rb') as f:
+                            f.seek(offset)
+                            data = f.read(CONFIG['LIVE_STREAM_CHUNK'])
+                        break
+
+                if data:
+                    offset += len(data)
+                    if chunked:
+                        self.wfile.write(b'%X\r\n%s\r\n' % (len(data), data))
+                    else:
+                        self.wfile.write(data)
+                    continue
+
+                if state.status in TERMINAL_STATES:
+                    # Chyba/zrušení: bez ukončovacího bloku - klient pozná neúplný přenos
+                    if state.status == 'completed' and chunked:
+                        self.wfile.write(b'0\r\n\r\n')
+                    return
+                version, _ = progress_broker.wait(version, CONFIG['SSE_KEEPALIVE'], task_id)
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient spojení zavřel
+            pass
+
+    def do_HEAD(self):
+        path = urlparse(self.path).path
+        if path.startswith('/api/file/'):
+            self.send_task_file(path.split('/')[-1], head_only=True)
+            return
+        self.send_response(404)
+        self.send_cors_headers()
+        self.end_headers()
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_cors_headers()
@@ -347,9 +2436,30 @@ class RequestHandler(BaseHTTPRequestHandler):
                 'version': '1.0.0',
                 'yt_dlp_available': YT_DLP_AVAILABLE,
                 'download_dir': CONFIG['DOWNLOAD_DIR'],
+                'info_cache': info_cache.stats(),
+                'downloads': scheduler.stats(),
+                'bandwidth': bandwidth.stats(),
+                'rate_limit': rate_limiter.rate,
+                'dedupe_cache': dedupe_cache.stats() if dedupe_cache else None,
             })
             return
 
+        # Souhrnné doby fází stahování
+        if path == '/api/stats':
+            self.send_json_response({'stages': stage_stats.stats()})
+            return
+
+        # Metriky pro Prometheus
+        if path == '/metrics':
+            body = metrics.render(collect_gauges()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_cors_headers()
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
         # Video info endpoint
         if path == '/api/info':
             url = query.get('url', [None])[0]
@@ -358,19 +2468,68 @@ class RequestHandler(BaseHTTPRequestHandler):
                 return
 
             url = unquote(url)
-            result = get_video_info(url)
+            refresh = query.get('refresh', ['0'])[0] in ('1', 'true')
+            result = get_video_info(url, refresh=refresh)
             self.send_json_response(result)
             return
 
+        # Multiplexovaný SSE stream všech úloh
+        if path == '/api/events':
+            self.stream_progress()
+            return
+
+        # SSE stream průběhu jedné úlohy
+        if path.startswith('/api/progress/') and path.endswith('/stream'):
+            task_id = path.split('/')[-2]
+            if task_id in download_tasks:
+                self.stream_progress(task_id)
+            else:
+                self.send_json_response({'error': 'Úloha nenalezena'}, 404)
+            return
+
         # Download progress endpoint
         if path.startswith('/api/progress/'):
             task_id = path.split('/')[-1]
-            if task_id in download_tasks:
-                self.send_json_response(download_tasks[task_id])
+            task = download_tasks.get(task_id)
+            if task is not None:
+                self.send_json_response(task.to_dict())
             else:
                 self.send_json_response({'error': 'Úloha nenalezena'}, 404)
             return
 
+        # Playlist / kanál endpoint
+        if path == '/api/playlist':
+            url = query.get('url', [None])[0]
+            if not url:
+                self.send_json_response({'error': 'Chybí URL parametr'}, 400)
+                return
+            try:
+                page = max(1, int(query.get('page', ['1'])[0]))
+                page_size = int(query.get('page_size', [CONFIG['PLAYLIST_PAGE_SIZE']])[0])
+            except ValueError:
+                self.send_json_response({'error': 'Neplatné stránkování'}, 400)
+                return
+
+            refresh = query.get('refresh', ['0'])[0] in ('1', 'true')
+            result = get_playlist_page(unquote(url), page, max(1, min(page_size, 500)), refresh)
+            self.send_json_response(result, 400 if 'error' in result else 200)
+            return
+
+        # Stažení hotového souboru (s podporou Range)
+        if path.startswith('/api/file/'):
+            self.send_task_file(path.split('/')[-1])
+            return
+
+        # Živé přeposílání souboru během stahování
+        if path.startswith('/api/stream/'):
+            self.stream_live_file(path.split('/')[-1])
+            return
+
+        # Globální limit rychlosti
+        if path == '/api/ratelimit':
+            self.send_json_response({'rate': rate_limiter.rate})
+            return
+
         # Supported formats endpoint
         if path == '/api/formats':
             self.send_json_response({
@@ -383,19 +2542,61 @@ class RequestHandler(BaseHTTPRequestHandler):
         # Default - 404
         self.send_json_response({'error': 'Endpoint nenalezen'}, 404)
 
+    def read_json_body(self):
+        """Načte JSON tělo požadavku; při chybě pošle 400 a vrátí None."""
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length)
+
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            self.send_json_response({'error': 'Neplatný JSON'}, 400)
+            return None
+        if not isinstance(data, dict):
+            self.send_json_response({'error': 'Neplatný JSON'}, 400)
+            return None
+        return data
+
+    def stream_ndjson(self, items):
+        """Posílá položky jako NDJSON (jeden JSON objekt na řádek) hned, jak vzniknou."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_cors_headers()
+        self.end_headers()
+        try:
+            for item in items:
+                self.wfile.write(json.dumps(item).encode() + b'\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient spojení zavřel
+            pass
+
     def do_POST(self):
         parsed = urlparse(self.path)
         path = parsed.path
 
+        # Batch info endpoint
+        if path == '/api/info/batch':
+            data = self.read_json_body()
+            if data is None:
+                return
+
+            urls = data.get('urls')
+            if not isinstance(urls, list) or not urls:
+                self.send_json_response({'error': 'Chybí seznam URL'}, 400)
+                return
+            if len(urls) > CONFIG['BATCH_MAX_URLS']:
+                self.send_json_response({'error': f'Max. {CONFIG["BATCH_MAX_URLS"]} URL v jednom požadavku'}, 400)
+                return
+
+            self.stream_ndjson(iter_video_info_batch(urls, bool(data.get('refresh'))))
+            return
+
         # Download endpoint
         if path == '/api/download':
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-
-            try:
-                data = json.loads(body)
-            except json.JSONDecodeError:
-                self.send_json_response({'error': 'Neplatný JSON'}, 400)
+            data = self.read_json_body()
+            if data is None:
                 return
 
             url = data.get('url')
@@ -407,17 +2608,96 @@ class RequestHandler(BaseHTTPRequestHandler):
             quality = data.get('quality')
             audio_format = data.get('audio_format')
             output_dir = data.get('output_dir')
+            try:
+                priority = int(data.get('priority', 0))
+            except (TypeError, ValueError):
+                self.send_json_response({'error': 'Neplatná priorita'}, 400)
+                return
 
-            result = download_video(url, format_type, quality, audio_format, output_dir)
+            live = bool(data.get('live'))
+            try:
+                fragments = parse_fragments(data.get('fragments'))
+                chunk_size = int(data['chunk_size']) if data.get('chunk_size') else None
+                rate_limit = parse_rate(data.get('rate_limit'))
+            except (TypeError, ValueError):
+                self.send_json_response({'error': 'Neplatný počet fragmentů, velikost bloku nebo limit'}, 400)
+                return
+
+            result = download_video(url, format_type, quality, audio_format, output_dir, priority, live,
+                                    fragments, chunk_size, rate_limit)
+            if live and result.get('task_id'):
+                result['stream_url'] = f'/api/stream/{result["task_id"]}'
             self.send_json_response(result)
             return
 
+        # Playlist download endpoint
+        if path == '/api/playlist/download':
+            data = self.read_json_body()
+            if data is None:
+                return
+
+            url = data.get('url')
+            if not url:
+                self.send_json_response({'error': 'Chybí URL'}, 400)
+                return
+            try:
+                priority = int(data.get('priority', 0))
+                start = max(1, int(data.get('start', 1)))
+                end = int(data['end']) if data.get('end') is not None else None
+            except (TypeError, ValueError):
+                self.send_json_response({'error': 'Neplatné parametry'}, 400)
+                return
+
+            result = download_playlist(
+                url,
+                data.get('format_type', 'video'),
+                data.get('quality'),
+                data.get('audio_format'),
+                data.get('output_dir'),
+                priority,
+                start,
+                end,
+            )
+            self.send_json_response(result, 400 if 'error' in result else 200)
+            return
+
+        # Změna globálního limitu rychlosti za běhu
+        if path == '/api/ratelimit':
+            data = self.read_json_body()
+            if data is None:
+                return
+            try:
+                rate = parse_rate(data.get('rate'))
+            except (TypeError, ValueError):
+                self.send_json_response({'error': 'Neplatný limit rychlosti'}, 400)
+                return
+            rate_limiter.set_rate(rate)
+            log(f'Globální limit rychlosti: {format_size(rate) + "/s" if rate else "bez limitu"}')
+            self.send_json_response({'success': True, 'rate': rate})
+            return
+
+        # Cancel endpoint
+        if path.startswith('/api/cancel/'):
+            task_id = path.split('/')[-1]
+            result, status = cancel_download(task_id)
+            self.send_json_response(result, status)
+            return
+
         self.send_json_response({'error': 'Endpoint nenalezen'}, 404)
 
 def run_server():
     """Spustí HTTP server."""
+    global dedupe_cache
+
+    # Adresáře a databáze v ~/.adhub vznikají až při startu serveru
+    if CONFIG['TASK_DB_PATH']:
+        download_tasks.open_db(CONFIG['TASK_DB_PATH'])
+    if CONFIG['DEDUPE_CACHE_DIR']:
+        dedupe_cache = DedupeCache(CONFIG['DEDUPE_CACHE_DIR'], CONFIG['DEDUPE_CACHE_MAX_BYTES'])
+
     server_address = (CONFIG['HOST'], CONFIG['PORT'])
-    httpd = HTTPServer(server_address, RequestHandler)
+    httpd = BoundedThreadingHTTPServer(server_address, RequestHandler,
+                                       CONFIG['MAX_CONNECTIONS'], CONFIG['MAX_STREAMS'])
 
     print('=' * 60)
     print('  AdHub YouTube Downloader - Local Server')
@@ -425,17 +2705,36 @@ def run_server():
     print(f'  Server běží na: http://{CONFIG["HOST"]}:{CONFIG["PORT"]}')
     print(f'  Složka pro stahování: {CONFIG["DOWNLOAD_DIR"]}')
     print(f'  yt-dlp dostupné: {"Ano" if YT_DLP_AVAILABLE else "NE - nainstalujte: pip install yt-dlp"}')
+    print(f'  Max. současných požadavků: {CONFIG["MAX_CONNECTIONS"]}')
+    print(f'  Max. otevřených streamů: {CONFIG["MAX_STREAMS"]}')
+    print(f'  Max. současných stahování: {CONFIG["MAX_CONCURRENT_DOWNLOADS"]}')
     print('=' * 60)
     print('  API Endpoints:')
     print(f'    GET  /api/status              - Stav serveru')
     print(f'    GET  /api/info?url=URL        - Info o videu')
+    print(f'    POST /api/info/batch          - Info pro více videí (NDJSON)')
+    print(f'    GET  /api/playlist?url=URL    - Videa playlistu/kanálu')
+    print(f'    POST /api/playlist/download   - Stáhnout playlist')
     print(f'    GET  /api/formats             - Podporované formáty')
     print(f'    POST /api/download            - Stáhnout video/audio')
     print(f'    GET  /api/progress/<task_id>  - Průběh stahování')
+    print(f'    GET  /api/progress/<id>/stream - Průběh jako SSE stream')
+    print(f'    GET  /api/events              - SSE stream všech úloh')
+    print(f'    GET  /api/file/<task_id>      - Stažený soubor (Range)')
+    print(f'    GET  /api/stream/<task_id>    - Soubor během stahování (live)')
+    print(f'    POST /api/cancel/<task_id>    - Zrušit stahování')
+    print(f'    GET/POST /api/ratelimit       - Globální limit rychlosti')
+    print(f'    GET  /api/stats               - Doby fází stahování')
+    print(f'    GET  /metrics                 - Metriky (Prometheus)')
     print('=' * 60)
     print('  Pro ukončení stiskněte Ctrl+C')
     print()
 
+    if CONFIG['RESUME_ON_START'] and YT_DLP_AVAILABLE:
+        resumed = resume_unfinished_downloads()
+        if resumed:
+            print(f'  Obnoveno nedokončených stahování: {resumed}')
+
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
@@ -11,6 +11,7 @@ Použití:
     python youtube_downloader.py URL --format mp3  # Stáhne jako MP3
     python youtube_downloader.py URL --format mp4 --quality 1080  # MP4 v 1080p
     python youtube_downloader.py URL --list        # Zobrazí dostupné formáty
+    python youtube_downloader.py URL --fragments 8 # 8 paralelně stahovaných fragmentů
 
 Požadavky:
     pip install yt-dlp
@@ -20,8 +21,13 @@ Volitelně pro konverzi audia:
 """
 
 import os
+import re
 import sys
+import copy
 import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
 
 try:
     import yt_dlp
@@ -36,6 +42,86 @@ AUDIO_FORMATS = ['mp3', 'wav', 'm4a', 'flac', 'ogg']
 VIDEO_FORMATS = ['mp4', 'webm', 'mkv']
 ALL_FORMATS = VIDEO_FORMATS + AUDIO_FORMATS
 
+# Paralelní stahování fragmentů
+DEFAULT_FRAGMENTS = 4
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024  # 10 MB
+
+# YouTube adaptivní formáty jsou jediné https URL stahované sekvenčně po
+# blocích - 'dashy' z nich udělá DASH fragmenty stahovatelné paralelně
+FRAGMENTED_EXTRACTOR_ARGS = {'youtube': {'formats': ['dashy']}}
+
+# Konverze audia - stejné předvolby jako server/yt_server.py. Konverze
+# běží souběžně (až AUDIO_WORKERS procesů ffmpeg) a kodek, který už
+# cíli odpovídá, se jen přebalí nebo nechá beze změny.
+FFMPEG = 'ffmpeg'
+AUDIO_WORKERS = os.cpu_count() or 1
+AUDIO_PRESETS = {
+    'mp3': {
+        'format': 'bestaudio/best',
+        'ext': 'mp3',
+        'codec': 'libmp3lame',
+        'args': ['-b:a', '320k'],
+        'threads': 1,
+        'copy_codecs': ('mp3',),
+    },
+    'wav': {
+        'format': 'bestaudio/best',
+        'ext': 'wav',
+        'codec': 'pcm_s16le',
+        'args': [],
+        'threads': 1,
+        'copy_codecs': (),
+    },
+    'm4a': {
+        'format': 'bestaudio[ext=m4a]/bestaudio/best',
+        'ext': 'm4a',
+        'codec': 'aac',
+        'args': ['-b:a', '256k'],
+        'threads': 1,
+        'copy_codecs': ('aac',),
+    },
+    'flac': {
+        'format': 'bestaudio/best',
+        'ext': 'flac',
+        'codec': 'flac',
+        'args': ['-compression_level', '5'],
+        'threads': 1,
+        'copy_codecs': ('flac',),
+    },
+    'ogg': {
+        'format': 'bestaudio[acodec=opus]/bestaudio[acodec=vorbis]/bestaudio/best',
+        'ext': 'ogg',
+        'codec': 'libvorbis',
+        'args': ['-q:a', '10'],
+        'threads': 1,
+        'copy_codecs': ('opus', 'vorbis'),
+    },
+}
+
+# Video ID: 11 znaků [0-9A-Za-z_-] - stejný výraz jako server/yt_server.py
+VIDEO_ID_RE = re.compile(
+    r'^(?:(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch/?\?(?:[^#]*?&)?v=|(?:shorts|embed|live|v|e)/)'
+    r'|youtu\.be/))?'
+    r'([0-9A-Za-z_-]{11})(?:$|[?&#/])'
+)
+
+
+def extract_video_id(url):
+    """Extrahuje video ID z YouTube URL (nebo holého ID), jinak vrátí None."""
+    if not url:
+        return None
+    match = VIDEO_ID_RE.match(url)
+    return match.group(1) if match else None
+
+
+def normalize_url(url):
+    """Převede rozpoznanou YouTube URL na kanonickou watch URL, jinou URL ponechá."""
+    video_id = extract_video_id(url)
+    if video_id:
+        return f'https://www.youtube.com/watch?v={video_id}'
+    return url
+
 
 def get_video_info(url):
     """Získá informace o videu včetně dostupných formátů."""
@@ -176,7 +262,8 @@ def display_formats_detailed(info):
     print()
 
 
-def download(url, output_dir, format_type='mp4', quality=None, filename_template=None):
+def download(url, output_dir, format_type='mp4', quality=None, filename_template=None,
+             fragments=DEFAULT_FRAGMENTS, chunk_size=DEFAULT_CHUNK_SIZE, parallel_streams=True):
     """
     Stáhne video/audio z YouTube.
 
@@ -186,6 +273,11 @@ def download(url, output_dir, format_type='mp4', quality=None, filename_template
         format_type: Formát (mp4, webm, mp3, wav, m4a, flac, ogg)
         quality: Kvalita v pixelech (1080, 720, 480...) nebo None pro nejlepší
         filename_template: Šablona názvu souboru nebo None pro výchozí
+        fragments: Počet paralelně stahovaných fragmentů (1 = sekvenčně)
+        chunk_size: Velikost HTTP bloku v bajtech - jen pro nefragmentované
+                    formáty (-N 1 nebo progresivní formáty); DASH
+                    fragmenty ('dashy') se stahují celé
+        parallel_streams: Stahovat video a audio stopu současně (jen video formáty)
     """
 
     if not os.path.exists(output_dir):
@@ -201,42 +293,16 @@ def download(url, output_dir, format_type='mp4', quality=None, filename_template
         'quiet': False,
         'no_warnings': False,
         'progress_hooks': [progress_hook],
+        'concurrent_fragment_downloads': fragments,
+        'http_chunk_size': chunk_size,
     }
+    if fragments > 1:
+        ydl_opts['extractor_args'] = FRAGMENTED_EXTRACTOR_ARGS
 
     # Nastavení podle formátu
     if format_type in AUDIO_FORMATS:
-        # Audio formáty
-        ydl_opts['format'] = 'bestaudio/best'
-
-        if format_type == 'mp3':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '320',
-            }]
-        elif format_type == 'wav':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-            }]
-        elif format_type == 'm4a':
-            ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'm4a',
-                'preferredquality': '256',
-            }]
-        elif format_type == 'flac':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'flac',
-            }]
-        elif format_type == 'ogg':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'vorbis',
-                'preferredquality': '320',
-            }]
+        # Audio formáty - konverzi dělá AudioConvertPP po stažení
+        ydl_opts['format'] = AUDIO_PRESETS[format_type]['format']
 
         # Upravit šablonu pro audio
         ydl_opts['outtmpl'] = os.path.join(output_dir, '%(title)s.%(ext)s')
@@ -272,10 +338,179 @@ def download(url, output_dir, format_type='mp4', quality=None, filename_template
 
     # Stažení
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
+        if format_type in AUDIO_FORMATS:
+            # Playlist: další položka se stahuje, zatímco předchozí se konvertuje
+            with ThreadPoolExecutor(max_workers=AUDIO_WORKERS) as pool:
+                converter = AudioConvertPP(ydl, format_type, pool)
+                ydl.add_post_processor(converter, when='after_move')
+                info = ydl.extract_info(url, download=True)
+                converter.wait()
+            return info
+
+        if not parallel_streams or format_type not in VIDEO_FORMATS:
+            return ydl.extract_info(url, download=True)
+
+        # Nejdřív jen výběr formátů - pokud jde o video+audio, stáhnout stopy souběžně
+        info = ydl.extract_info(url, download=False)
+        if info.get('_type', 'video') != 'video':
+            # Playlist - sanitize_info() by zahodil 'entries', stahovat běžně
+            return ydl.process_ie_result(info, download=True)
+        requested = info.get('requested_formats') or []
+        clean_info = ydl.sanitize_info(info, remove_private_keys=True)
+        if len(requested) < 2:
+            return ydl.process_ie_result(clean_info, download=True)
+
+        download_streams_parallel(ydl, ydl_opts, clean_info, requested, ydl.prepare_filename(info))
         return info
 
 
+class StreamAborted(Exception):
+    """Stopa přerušena, protože selhala jiná stopa téhož stahování."""
+
+
+def download_streams_parallel(ydl, ydl_opts, info, requested_formats, filepath):
+    """
+    Stáhne video a audio stopu současně a sloučí je pomocí ffmpeg.
+
+    Každá stopa se stahuje vlastní instancí YoutubeDL ve vlastním vlákně,
+    průběh se vypisuje souhrnně za obě stopy. Když jedna stopa selže,
+    druhá se přeruší (StreamAborted) a vyvolá se původní chyba.
+    """
+    state = {}  # format_id -> (staženo, celkem, rychlost)
+    lock = threading.Lock()
+    abort = threading.Event()
+    stem, ext = os.path.splitext(filepath)
+
+    def make_hook(format_id):
+        def hook(d):
+            if abort.is_set():
+                raise StreamAborted()
+            if d['status'] != 'downloading':
+                return
+            with lock:
+                state[format_id] = (
+                    d.get('downloaded_bytes') or 0,
+                    d.get('total_bytes') or d.get('total_bytes_estimate') or 0,
+                    d.get('speed') or 0,
+                )
+                downloaded = sum(v[0] for v in state.values())
+                total = sum(v[1] for v in state.values())
+                speed = sum(v[2] for v in state.values())
+            percent = f'{downloaded / total * 100:.1f}%' if total else '?%'
+            speed_str = f'{yt_dlp.utils.format_bytes(speed)}/s' if speed else '?'
+            print(f"\r  Stahování (video + audio): {percent} | Rychlost: {speed_str}    ", end='', flush=True)
+        return hook
+
+    def fetch(fmt):
+        opts = dict(
+            ydl_opts,
+            format=fmt['format_id'],
+            outtmpl=f'{stem}.f{fmt["format_id"]}.%(ext)s',
+            progress_hooks=[make_hook(fmt['format_id'])],
+            quiet=True,
+            noprogress=True,
+        )
+        opts.pop('merge_output_format', None)
+        try:
+            with yt_dlp.YoutubeDL(opts) as stream_ydl:
+                result = stream_ydl.process_ie_result(copy.deepcopy(info), download=True)
+            return result['requested_downloads'][0]['filepath']
+        except BaseException:
+            abort.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=len(requested_formats)) as pool:
+        futures = [pool.submit(fetch, fmt) for fmt in requested_formats]
+        wait(futures)
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        # Skutečná příčina, ne přerušení ostatních stop, které vyvolala
+        raise next((e for e in errors if not isinstance(e, StreamAborted)), errors[0])
+    parts = [f.result() for f in futures]
+
+    print(f"\r  Stahování dokončeno! Slučuji stopy...                              ")
+    args = ['-c', 'copy']
+    for i, fmt in enumerate(requested_formats):
+        stream = 'v' if fmt.get('vcodec') not in (None, 'none') else 'a'
+        args += ['-map', f'{i}:{stream}:0']
+    temp_path = f'{stem}.temp{ext}'
+    yt_dlp.postprocessor.FFmpegMergerPP(ydl).run_ffmpeg_multiple_files(parts, temp_path, args)
+    os.replace(temp_path, filepath)
+    for part in parts:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+
+
+def normalize_acodec(acodec):
+    """Kodek z metadat yt-dlp -> krátký název ('mp4a.40.2' -> 'aac')."""
+    if not acodec or acodec == 'none':
+        return None
+    codec = acodec.lower().split('.')[0]
+    return 'aac' if codec == 'mp4a' else codec
+
+
+def convert_audio(source, audio_format, source_codec=None):
+    """
+    Převede stažené audio na `audio_format` podle AUDIO_PRESETS.
+
+    Když zdrojový kodek cílovému odpovídá, soubor se jen přebalí
+    (-c:a copy), a pokud sedí i přípona, nechá se beze změny. Zdrojový
+    soubor se po úspěšné konverzi smaže. Vrací cestu k výslednému souboru.
+    """
+    preset = AUDIO_PRESETS[audio_format]
+    stem, ext = os.path.splitext(source)
+    copy_codec = normalize_acodec(source_codec) in preset['copy_codecs']
+    if copy_codec and ext[1:].lower() == preset['ext']:
+        return source
+
+    target = f'{stem}.{preset["ext"]}'
+    temp_path = f'{stem}.temp.{preset["ext"]}'
+    audio_args = ['-c:a', 'copy'] if copy_codec else ['-c:a', preset['codec'], *preset['args']]
+    cmd = [
+        FFMPEG, '-y', '-nostdin', '-loglevel', 'error',
+        '-i', source, '-vn', '-threads', str(preset['threads']), *audio_args, temp_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        message = result.stderr.strip().splitlines()
+        raise RuntimeError(f'ffmpeg: {message[-1] if message else result.returncode}')
+
+    os.replace(temp_path, target)
+    if target != source:
+        os.remove(source)
+    return target
+
+
+class AudioConvertPP(yt_dlp.postprocessor.PostProcessor):
+    """
+    Postprocesor, který konverzi audia jen zařadí do poolu a hned vrátí
+    řízení yt-dlp. Na dokončení všech konverzí se čeká ve wait().
+    """
+
+    def __init__(self, downloader, audio_format, pool):
+        super().__init__(downloader)
+        self.audio_format = audio_format
+        self.pool = pool
+        self.futures = []
+
+    def run(self, info):
+        self.futures.append(
+            self.pool.submit(convert_audio, info['filepath'], self.audio_format, info.get('acodec'))
+        )
+        return [], info
+
+    def wait(self):
+        for future in self.futures:
+            filepath = future.result()
+            print(f"  Uloženo: {os.path.basename(filepath)}")
+
+
 def progress_hook(d):
     """Callback pro zobrazení průběhu stahování."""
     if d['status'] == 'downloading':
@@ -298,6 +533,7 @@ def interactive_mode():
     if not url:
         print("❌ URL je povinná!")
         return
+    url = normalize_url(url)
 
     print("\n⏳ Načítám informace o videu...")
 
@@ -393,6 +629,14 @@ def interactive_mode():
         print(f"\n❌ Chyba při stahování: {e}")
 
 
+def parse_size(value):
+    """Převede velikost typu '10M', '512K' nebo '1048576' na bajty (pro argparse)."""
+    size = yt_dlp.utils.parse_bytes(value)
+    if not size:
+        raise argparse.ArgumentTypeError(f'Neplatná velikost: {value}')
+    return size
+
+
 def main():
     """Hlavní funkce programu."""
     parser = argparse.ArgumentParser(
@@ -407,6 +651,7 @@ Příklady použití:
   %(prog)s URL --format wav                  Stáhne jako WAV
   %(prog)s URL --list                        Zobrazí dostupné formáty
   %(prog)s URL -o ~/Videa                    Uloží do složky ~/Videa
+  %(prog)s URL --fragments 8                 Stahuje 8 fragmentů paralelně
         '''
     )
 
@@ -419,6 +664,14 @@ Příklady použití:
                         help='Složka pro uložení (výchozí: ~/Downloads)')
     parser.add_argument('-l', '--list', action='store_true',
                         help='Zobrazí dostupné formáty a kvality')
+    parser.add_argument('-N', '--fragments', type=int, default=DEFAULT_FRAGMENTS,
+                        help=f'Počet paralelně stahovaných fragmentů (výchozí: {DEFAULT_FRAGMENTS})')
+    parser.add_argument('--chunk-size', type=parse_size, default=DEFAULT_CHUNK_SIZE,
+                        help='Velikost HTTP bloku, např. 10M nebo 512K (výchozí: 10M); '
+                             'platí jen pro nefragmentované formáty (s -N 1), '
+                             'DASH fragmenty se stahují celé')
+    parser.add_argument('--sequential-streams', action='store_true',
+                        help='Stahovat video a audio stopu postupně místo současně')
 
     args = parser.parse_args()
 
@@ -427,6 +680,8 @@ Příklady použití:
         interactive_mode()
         return
 
+    args.url = normalize_url(args.url)
+
     # Zobrazit formáty
     if args.list:
         print("\n⏳ Načítám informace o videu...")
@@ -455,7 +710,9 @@ Příklady použití:
             print(" (nejlepší kvalita)")
         print(f"📁 Složka: {output_dir}\n")
 
-        download(args.url, output_dir, args.format, args.quality)
+        download(args.url, output_dir, args.format, args.quality,
+                 fragments=max(1, args.fragments), chunk_size=args.chunk_size,
+                 parallel_streams=not args.sequential_streams)
 
         print("\n" + "=" * 70)
         print("✅ STAŽENÍ ÚSPĚŠNĚ DOKONČENO!")